@@ -1,15 +1,15 @@
 import datetime
 from typing import Annotated
-import bcrypt
 
 from fastapi import Depends, HTTPException
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy import select, update
 
-from db import get_session
+from api.user.cache import invalidate_users
+from db import RequestSession, get_request_session
 from middlewares.authentication import generate_access_token, generate_refresh_token
 from models.user import User, UserSchema
+from utils.password import password_hasher
 from .schemas import (
     RegisterRequest,
     LoginRequest,
@@ -17,7 +17,7 @@ from .schemas import (
     ChangePasswordRequest,
 )
 
-AsyncSession = Annotated[async_sessionmaker, Depends(get_session)]
+AsyncSession = Annotated[RequestSession, Depends(get_request_session)]
 
 
 class Register:
@@ -25,6 +25,10 @@ class Register:
         self.async_session = session
 
     async def execute(self, request: RegisterRequest) -> UserSchema:
+        # hashed before the transaction, which would otherwise hold a connection
+        # for the whole bcrypt run
+        hashed_pw = await password_hasher.hash(request.password)
+
         async with self.async_session.begin() as session:
             usr = await session.execute(
                 select(User).where(User.username == request.username)
@@ -40,18 +44,11 @@ class Register:
             if usr is not None:
                 raise HTTPException(400, f"email: {request.email} is already taken")
 
-            pw_bytes = request.password.encode()
-            salt = bcrypt.gensalt()
-            hashed_pw = bcrypt.hashpw(
-                password=pw_bytes,
-                salt=salt,
-            )
-
             user = User()
             user.name = request.name
             user.email = request.email
             user.username = request.username
-            user.password = hashed_pw.decode()
+            user.password = hashed_pw
             user.created_at = datetime.datetime.utcnow()
             user.updated_at = datetime.datetime.utcnow()
 
@@ -80,26 +77,28 @@ class LoginUser:
                 )
             )
             user = user.scalars().first()
-            if user is None:
-                raise HTTPException(
-                    401,
-                    "login failed, make sure your credential are correct and try again",
-                )
-            password_matched = bcrypt.checkpw(
-                password=data.password.encode(),
-                hashed_password=user.password.encode(),
+
+        # the session is closed, bcrypt does not hold a connection
+        if user is None:
+            raise HTTPException(
+                401,
+                "login failed, make sure your credential are correct and try again",
+            )
+        password_matched = await password_hasher.check(
+            password=data.password,
+            hashed_password=user.password,
+        )
+        if not password_matched:
+            raise HTTPException(
+                401,
+                "login failed, make sure your credential are correct and try again",
             )
-            if not password_matched:
-                raise HTTPException(
-                    401,
-                    "login failed, make sure your credential are correct and try again",
-                )
 
-            resp_data = UserTokenSchema.from_orm(user)
-            resp_data.access_token = generate_access_token(user.user_id)
-            resp_data.refresh_token = generate_refresh_token(user.user_id)
+        resp_data = UserTokenSchema.from_orm(user)
+        resp_data.access_token = generate_access_token(user.user_id)
+        resp_data.refresh_token = generate_refresh_token(user.user_id)
 
-            return resp_data
+        return resp_data
 
 
 class ChangePassword:
@@ -111,32 +110,48 @@ class ChangePassword:
         data: ChangePasswordRequest,
         user_id: int,
     ) -> None:
-        async with self.async_session.begin() as session:
-            user = await session.execute(
-                select(User).where(
+        async with self.async_session() as session:
+            old_password = await session.execute(
+                select(User.password).where(
                     (User.user_id == user_id).__and__(User.deactivated_at == None)
                 )
             )
-            user = user.scalars().first()
-            if user is None:
-                raise HTTPException(404, f"user with id: {user_id} does not exist")
+            old_password = old_password.scalar()
 
-            password_matched = bcrypt.checkpw(
-                password=data.old_password.encode(),
-                hashed_password=user.password.encode(),
-            )
-            if not password_matched:
-                raise HTTPException(400, "incorrect password")
+        # both bcrypt runs happen outside the session, without a connection
+        if old_password is None:
+            raise HTTPException(404, f"user with id: {user_id} does not exist")
 
-            pw_bytes = data.new_password.encode()
-            salt = bcrypt.gensalt()
-            hashed_pw = bcrypt.hashpw(
-                password=pw_bytes,
-                salt=salt,
+        password_matched = await password_hasher.check(
+            password=data.old_password,
+            hashed_password=old_password,
+        )
+        if not password_matched:
+            raise HTTPException(400, "incorrect password")
+
+        new_password = await password_hasher.hash(data.new_password)
+
+        async with self.async_session.begin() as session:
+            # only if the password checked above is still the current one
+            user = await session.execute(
+                update(User)
+                .where(
+                    (User.user_id == user_id)
+                    .__and__(User.deactivated_at == None)
+                    .__and__(User.password == old_password)
+                )
+                .values(
+                    password=new_password,
+                    updated_at=datetime.datetime.utcnow(),
+                    updated_by=user_id,
+                )
+                .returning(User.user_id)
+                .execution_options(synchronize_session=False)
             )
+            if user.first() is None:
+                raise HTTPException(400, "incorrect password")
 
-            user.password = hashed_pw.decode()
-            user.updated_at = datetime.datetime.utcnow()
-            user.updated_by = user_id
+        async def committed() -> None:
+            invalidate_users(user_id)
 
-            await session.flush()
+        await self.async_session.after_commit(committed)
@@ -42,6 +42,8 @@ async def register(
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
+        if ex.headers:
+            response.headers.update(ex.headers)
         return RegisterResponse(
             status="error",
             message=ex.detail,
@@ -79,6 +81,8 @@ async def login(
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
+        if ex.headers:
+            response.headers.update(ex.headers)
         return LoginResponse(
             status="error",
             message=ex.detail,
@@ -112,6 +116,8 @@ async def refresh_token(
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
+        if ex.headers:
+            response.headers.update(ex.headers)
         return RefreshTokenResponse(
             status="error",
             message=ex.detail,
@@ -146,6 +152,8 @@ async def change_password(
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
+        if ex.headers:
+            response.headers.update(ex.headers)
         return BaseResponse(
             status="error",
             message=ex.detail,
@@ -1,22 +1,40 @@
 from __future__ import annotations
 
+from enum import Enum
+from typing import Any
+
 from pydantic import Field, BaseModel
 
 
+class CountMode(str, Enum):
+    """How total_item is computed for a paginated listing."""
+
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
 class PaginationParams(BaseModel):
     """Request query params for paginated API."""
 
     page: int = Field(ge=1, default=1)
     item_per_page: int = Field(ge=1, le=100, default=10)
+    count: CountMode = Field(default=CountMode.EXACT)
 
 
 class PaginationMetaResponse(BaseModel):
-    total_item: int = Field(default=0)
+    total_item: int | None = Field(default=0)
     item_per_page: int = Field(default=10)
     page: int = Field(default=1)
-    total_page: int = Field(default=1)
+    total_page: int | None = Field(default=1)
+    has_next: bool = Field(default=False)
+    next_cursor: str | None = Field(default=None)
 
 
 class BaseResponse(BaseModel):
     status: str = Field(default="success")
     message: str = Field(default="")
+
+
+class MetricsResponse(BaseResponse):
+    data: dict[str, dict[str, Any]] | None
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Response
 
-from .base_schemas import BaseResponse
+from utils.metrics import collect_metrics
+
+from .base_schemas import BaseResponse, MetricsResponse
 router = APIRouter(prefix="/health")
 tag = "Health"
 
@@ -20,4 +22,19 @@ def get_health(response: Response) -> BaseResponse:
     Returns:
         HealthCheck: Returns a JSON response with the health status
     """
-    return BaseResponse(message="OK")
\ No newline at end of file
+    return BaseResponse(message="OK")
+
+
+@router.get(
+    path="/metrics",
+    tags=["healthcheck"],
+    summary="Internal counters",
+    response_model=MetricsResponse,
+)
+def get_metrics(response: Response) -> MetricsResponse:
+    """
+    ## Internal counters
+    Snapshot of in-process counters (cache hits and misses, pool usage) of the
+    worker that serves the request.
+    """
+    return MetricsResponse(message="OK", data=collect_metrics())
@@ -0,0 +1,68 @@
+import logging
+
+from models.note import NoteSchema
+from settings import settings
+from utils.cache import create_cache_backend
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# left by invalidate_notes in place of the note, reads treat it as a miss
+TOMBSTONE = b""
+
+note_cache_backend = settings.NOTE_CACHE_BACKEND
+if not note_cache_backend:
+    # memory is per process: with several serve workers an update would only
+    # evict the writing worker's copy, the others keep serving the old note
+    note_cache_backend = "none" if settings.WEB_CONCURRENCY > 1 else "memory"
+elif note_cache_backend == "memory" and settings.WEB_CONCURRENCY > 1:
+    logger.warning(
+        "NOTE_CACHE_BACKEND=memory with %s workers, other workers serve a changed"
+        " note for up to NOTE_CACHE_TTL_SECONDS",
+        settings.WEB_CONCURRENCY,
+    )
+
+# serialized NoteSchema of live notes by note_id, in front of GetNote
+note_cache = create_cache_backend(
+    backend=note_cache_backend,
+    url=settings.NOTE_CACHE_URL,
+    maxsize=settings.NOTE_CACHE_SIZE,
+    ttl=settings.NOTE_CACHE_TTL_SECONDS,
+)
+if note_cache is not None:
+    register_metrics("note_cache", note_cache.stats)
+
+
+def note_cache_key(note_id: int) -> str:
+    return f"note:{note_id}"
+
+
+async def get_cached_note(note_id: int) -> NoteSchema | None:
+    if note_cache is None:
+        return None
+
+    value = await note_cache.get(note_cache_key(note_id))
+    if not value:
+        return None
+
+    return NoteSchema.parse_raw(value)
+
+
+async def cache_note(note: NoteSchema) -> None:
+    """Fill the cache after a miss; never replaces an entry or a tombstone."""
+    if note_cache is not None:
+        await note_cache.add(note_cache_key(note.note_id), note.json().encode())
+
+
+async def invalidate_notes(*note_ids: int) -> None:
+    """
+    Drop notes from the cache; call it once the writing transaction committed.
+    The tombstone left for NOTE_CACHE_TOMBSTONE_SECONDS refuses fills, so a read
+    that loaded the note before the write cannot put the old version back.
+    """
+    if note_cache is not None and note_ids:
+        await note_cache.set_many(
+            (note_cache_key(note_id) for note_id in note_ids),
+            TOMBSTONE,
+            ttl=settings.NOTE_CACHE_TOMBSTONE_SECONDS,
+        )
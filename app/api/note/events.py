@@ -0,0 +1,234 @@
+import asyncio
+import contextlib
+import json
+import logging
+from enum import Enum
+from typing import AsyncIterator, Iterator
+
+import asyncpg
+from pydantic import BaseModel
+from sqlalchemy import func, select
+
+from db import async_engine
+from models.note import NoteSchema
+from settings import settings
+from utils.metrics import register_metrics
+from utils.pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class NoteEventType(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
+class NoteEvent(BaseModel):
+    type: NoteEventType
+    note: NoteSchema
+
+
+class NoteEventBroker:
+    """
+    In-process fan out of note events to the subscribed streams of their owner.
+    A subscriber that falls QUEUE_SIZE events behind gets None instead of the rest
+    and should resync through /notes/changes.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self.subscribers: dict[int, set[asyncio.Queue]] = {}
+        self.published = 0
+        self.overflowed = 0
+
+    @contextlib.contextmanager
+    def subscribe(self, user_id: int) -> Iterator[asyncio.Queue]:
+        queue = asyncio.Queue(maxsize=self.queue_size + 1)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers[user_id]
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def dispatch(self, event: NoteEvent) -> None:
+        self.published += 1
+        for queue in tuple(self.subscribers.get(event.note.created_by, ())):
+            if queue.qsize() < self.queue_size:
+                queue.put_nowait(event)
+            else:
+                self.overflow(queue)
+
+    def overflow(self, queue: asyncio.Queue) -> None:
+        # the spare slot holds the marker, nothing is queued after it
+        if not queue.full():
+            queue.put_nowait(None)
+            self.overflowed += 1
+
+    def resync(self, user_id: int) -> None:
+        """Send user_id's subscribers to resync, after events may have been missed."""
+        for queue in tuple(self.subscribers.get(user_id, ())):
+            self.overflow(queue)
+
+    def resync_all(self) -> None:
+        for user_id in tuple(self.subscribers):
+            self.resync(user_id)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "subscribers": sum(len(q) for q in self.subscribers.values()),
+            "published": self.published,
+            "overflowed": self.overflowed,
+        }
+
+
+note_events = NoteEventBroker(queue_size=settings.NOTE_EVENTS_QUEUE_SIZE)
+register_metrics("note_events", note_events.stats)
+
+
+# bytes, postgres rejects a longer NOTIFY payload and aborts the transaction
+NOTIFY_PAYLOAD_LIMIT = 8000
+
+
+def note_event_payload(event: NoteEvent) -> str:
+    # UTF-8 rather than \uXXXX escapes: an emoji takes 4 bytes instead of 12
+    payload = event.json(ensure_ascii=False)
+    if len(payload.encode()) <= NOTIFY_PAYLOAD_LIMIT:
+        return payload
+
+    # the owner's streams catch up through /notes/changes instead
+    logger.warning("note %s event too large for NOTIFY", event.note.note_id)
+    return json.dumps({"resync": event.note.created_by})
+
+
+async def publish_note_events(*events: NoteEvent) -> None:
+    """
+    Publish events; call it once the writing transaction committed. With
+    NOTE_EVENTS_BRIDGE they go through NOTIFY, so every worker's listener
+    (this one included) dispatches them. If NOTIFY fails the write stays
+    committed: the owners' streams on this worker are sent to resync, and the
+    other workers' streams miss the events.
+    """
+    if not settings.NOTE_EVENTS_BRIDGE:
+        for event in events:
+            note_events.dispatch(event)
+        return
+
+    try:
+        async with async_engine.begin() as conn:
+            for event in events:
+                await conn.execute(
+                    select(
+                        func.pg_notify(
+                            settings.NOTE_EVENTS_CHANNEL, note_event_payload(event)
+                        )
+                    )
+                )
+    except Exception:
+        logger.exception("failed to publish %s note events", len(events))
+        for user_id in {event.note.created_by for event in events}:
+            note_events.resync(user_id)
+
+
+def format_sse(event: str, data: str, id: str | None = None) -> str:
+    lines = [f"event: {event}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def note_event_stream(user_id: int) -> AsyncIterator[str]:
+    """
+    Server-sent events of user_id's notes. Event ids are /notes/changes watermarks,
+    so a client can catch up from the last one it saw after a resync event.
+    """
+    with note_events.subscribe(user_id) as queue:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=settings.NOTE_EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+
+            if event is None:
+                yield format_sse("resync", "{}")
+                return
+
+            yield format_sse(
+                event.type.value,
+                event.note.json(),
+                id=encode_cursor(event.note.updated_at, event.note.note_id),
+            )
+
+
+LISTENER_RETRY_SECONDS = 5
+
+
+class NoteEventListener:
+    """LISTEN on NOTE_EVENTS_CHANNEL and dispatch to the local broker, reconnecting."""
+
+    def __init__(self, broker: NoteEventBroker, dsn: str, channel: str) -> None:
+        self.broker = broker
+        self.dsn = dsn
+        self.channel = channel
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+    def on_notification(self, conn, pid, channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            if "resync" in data:
+                # sent in place of an event too large for NOTIFY
+                self.broker.resync(int(data["resync"]))
+            else:
+                self.broker.dispatch(NoteEvent.parse_obj(data))
+        except (TypeError, ValueError):
+            logger.warning("dropping malformed note event: %.200s", payload)
+
+    async def listen(self) -> None:
+        """LISTEN on a new connection until that connection is lost."""
+        conn = await asyncpg.connect(self.dsn)
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _: closed.set())
+        try:
+            await conn.add_listener(self.channel, self.on_notification)
+            await closed.wait()
+        finally:
+            if not conn.is_closed():
+                await conn.close()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.listen()
+                logger.warning("note event listener connection lost, reconnecting")
+            except Exception:
+                logger.exception("note event listener failed, reconnecting")
+                await asyncio.sleep(LISTENER_RETRY_SECONDS)
+            # notifications sent until the new LISTEN are lost
+            self.broker.resync_all()
+
+
+note_event_listener = NoteEventListener(
+    note_events,
+    dsn=settings.DB_DSN.replace("+asyncpg", ""),
+    channel=settings.NOTE_EVENTS_CHANNEL,
+)
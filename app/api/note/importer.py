@@ -0,0 +1,77 @@
+import codecs
+import csv
+import json
+from pathlib import Path
+from typing import AsyncIterator
+
+from .schemas import ExportFormat
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+async def read_file_chunks(path: Path) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding more than one chunk."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_import_records(
+    chunks: AsyncIterator[bytes], format: ExportFormat
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Yield (row number, raw record, parse error) for every data row of the input."""
+    row = 0
+    if format is ExportFormat.NDJSON:
+        async for line in iter_lines(chunks):
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, f"invalid json: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, None, "invalid json: expecting an object"
+                continue
+            yield row, record, None
+        return
+
+    header = None
+    pending = ""
+    async for line in iter_lines(chunks):
+        # a quoted field may span lines, a record is complete once quotes are balanced
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = values
+            continue
+
+        row += 1
+        if len(values) != len(header):
+            yield row, None, f"expecting {len(header)} columns, got {len(values)}"
+            continue
+        yield row, {k: v for k, v in zip(header, values) if v != ""}, None
+
+    if pending.strip():
+        yield row + 1, None, "unterminated quoted field"
@@ -1,7 +1,11 @@
-from pydantic import BaseModel, Field
+import datetime
+from enum import Enum
+
+from pydantic import BaseModel, Field, root_validator, validator
 from api.base.base_schemas import BaseResponse, PaginationParams, PaginationMetaResponse
 
 from models.note import NoteSchema
+from settings import settings
 
 class AddNoteRequest(BaseModel):
     title: str = Field(..., min_length=1, max_length=255)
@@ -25,8 +29,118 @@ class NotePaginationResponse(BaseModel):
     meta: PaginationMetaResponse
     
 class GetAllNotesResponse(BaseResponse):
-    data: NotePaginationResponse
+    data: NotePaginationResponse | None
 
-class GetAllNotesRequest(PaginationParams):
+class NoteFilterParams(BaseModel):
     filter_by_user_id: bool = True
-    include_deleted_note: bool = False
\ No newline at end of file
+    include_deleted_note: bool = False
+
+class GetAllNotesRequest(PaginationParams, NoteFilterParams):
+    # keyset pagination, opt in with cursor=true or by passing a previous next_cursor
+    cursor: bool = False
+    after: str | None = None
+    # sparse fieldset, comma separated NoteSchema fields (e.g. note_id,title)
+    fields: str | None = None
+
+    @property
+    def use_cursor(self) -> bool:
+        return self.cursor or self.after is not None
+
+class NoteChangesRequest(BaseModel):
+    # watermark from a previous response, omitted for the initial sync
+    since: str | None = None
+    item_per_page: int = Field(ge=1, le=500, default=100)
+
+class NoteTombstone(BaseModel):
+    note_id: int
+    deleted_at: datetime.datetime
+
+class NoteChanges(BaseModel):
+    changes: list[NoteSchema]
+    deleted: list[NoteTombstone]
+    watermark: str | None
+    has_more: bool
+
+class NoteChangesResponse(BaseResponse):
+    data: NoteChanges | None
+
+class SearchNotesRequest(NoteFilterParams):
+    q: str = Field(..., min_length=1, max_length=200)
+    item_per_page: int = Field(ge=1, le=100, default=10)
+    after: str | None = None
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class ExportNotesRequest(NoteFilterParams):
+    format: ExportFormat = ExportFormat.NDJSON
+
+class NoteBatchUpdateItem(UpdateNoteRequest):
+    note_id: int
+
+class NoteBatchRequest(BaseModel):
+    create: list[AddNoteRequest] = Field(default_factory=list)
+    update: list[NoteBatchUpdateItem] = Field(default_factory=list)
+    delete: list[int] = Field(default_factory=list)
+
+    @root_validator(skip_on_failure=True)
+    def check_operations(cls, values: dict) -> dict:
+        total = sum(len(values[op]) for op in ("create", "update", "delete"))
+        if total == 0:
+            raise ValueError("batch must contain at least one operation")
+        if total > settings.NOTE_BATCH_MAX_OPERATIONS:
+            raise ValueError(
+                f"batch is limited to {settings.NOTE_BATCH_MAX_OPERATIONS} operations"
+            )
+
+        note_ids = [item.note_id for item in values["update"]] + values["delete"]
+        if len(note_ids) != len(set(note_ids)):
+            raise ValueError("a note can only appear once per batch")
+
+        return values
+
+class NoteBatchItemResult(BaseModel):
+    note_id: int | None
+    status: str = Field(default="success")
+    message: str = Field(default="")
+    data: NoteSchema | None
+
+class NoteBatchResult(BaseModel):
+    create: list[NoteBatchItemResult]
+    update: list[NoteBatchItemResult]
+    delete: list[NoteBatchItemResult]
+
+class NoteBatchResponse(BaseResponse):
+    data: NoteBatchResult | None
+
+class ImportNoteRow(AddNoteRequest):
+    created_by: int
+    created_at: datetime.datetime | None
+
+    # rows are checked one by one here, COPY would fail the whole chunk instead
+    @validator("title", "content")
+    def check_text(cls, v: str) -> str:
+        if "\x00" in v:
+            raise ValueError("NUL characters are not allowed")
+        return v
+
+    @validator("created_at")
+    def to_naive_utc(cls, v: datetime.datetime | None) -> datetime.datetime | None:
+        # the columns hold naive UTC, like the utcnow() stamps of the app
+        if v is not None and v.tzinfo is not None:
+            v = v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return v
+
+class NoteImportError(BaseModel):
+    row: int
+    message: str
+
+class NoteImportReport(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: list[NoteImportError] = Field(default_factory=list)
+    errors_truncated: bool = False
+
+class NoteImportResponse(BaseResponse):
+    data: NoteImportReport | None
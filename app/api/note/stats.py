@@ -0,0 +1,149 @@
+import datetime
+import logging
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncSessionLocal
+from models.note import Note
+from models.user_note_stats import UserNoteStats
+
+logger = logging.getLogger(__name__)
+
+
+async def lock_note_stats(session: AsyncSession, *user_ids: int) -> datetime.datetime:
+    """
+    Lock the counter rows of user_ids for the rest of the transaction, then return
+    the time to stamp the written notes with, read from the database clock once
+    the locks are held. /notes/changes takes the same rows in share mode (see
+    settle_note_changes), so it waits for the commit of a write stamped before it
+    and a write stamped after it cannot commit below its watermark, however long
+    the transaction runs.
+    """
+    now = None
+    # sorted, so writers locking several users cannot deadlock each other
+    for user_id in sorted(user_ids):
+        stmt = insert(UserNoteStats).values(
+            user_id=user_id, active_notes=0, deleted_notes=0, version=0
+        )
+        # a no-op update still locks an existing row
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserNoteStats.user_id],
+            set_={"version": UserNoteStats.version},
+        )
+        # RETURNING runs once the row is locked, past any lock wait; naive UTC
+        # like the utcnow() stamps of the app
+        stmt = stmt.returning(func.timezone("utc", func.clock_timestamp()))
+        # core execution, the ORM insert path only returns entities and columns
+        conn = await session.connection()
+        now = await conn.scalar(stmt)
+
+    return now or datetime.datetime.utcnow()
+
+
+async def settle_note_changes(session: AsyncSession, user_id: int) -> None:
+    """
+    Wait for the open note writes of user_id and hold off new ones until the
+    transaction ends. Reads after it see every write stamped before them.
+    """
+    # an uncommitted first write of the user holds the insert, DO NOTHING waits for it
+    await session.execute(
+        insert(UserNoteStats)
+        .values(user_id=user_id, active_notes=0, deleted_notes=0, version=0)
+        .on_conflict_do_nothing(index_elements=[UserNoteStats.user_id])
+    )
+    await session.execute(
+        select(UserNoteStats.user_id)
+        .where(UserNoteStats.user_id == user_id)
+        .with_for_update(read=True)
+    )
+
+
+async def update_note_stats(
+    session: AsyncSession,
+    user_id: int,
+    active_delta: int = 0,
+    deleted_delta: int = 0,
+) -> None:
+    """
+    Apply counter deltas for user_id and bump its listing version, inside the
+    transaction writing the notes. Call it for every note write, even without deltas.
+    """
+    stmt = insert(UserNoteStats).values(
+        user_id=user_id,
+        active_notes=active_delta,
+        deleted_notes=deleted_delta,
+        version=1,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserNoteStats.user_id],
+        set_={
+            "active_notes": UserNoteStats.active_notes + active_delta,
+            "deleted_notes": UserNoteStats.deleted_notes + deleted_delta,
+            "version": UserNoteStats.version + 1,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def get_note_listing_version(session: AsyncSession, user_id: int) -> int:
+    version = await session.execute(
+        select(UserNoteStats.version).where(UserNoteStats.user_id == user_id)
+    )
+    return version.scalar() or 0
+
+
+async def get_note_stats(session: AsyncSession, user_id: int) -> UserNoteStats | None:
+    stats = await session.execute(
+        select(UserNoteStats).where(UserNoteStats.user_id == user_id)
+    )
+    return stats.scalars().first()
+
+
+async def reconcile_note_stats(session: AsyncSession) -> None:
+    """Rebuild every counter from the notes table."""
+    # block concurrent counter updates so the recount cannot race a note write
+    await session.execute(
+        text("LOCK TABLE user_note_stats IN SHARE ROW EXCLUSIVE MODE")
+    )
+
+    counts = (
+        select(
+            Note.created_by,
+            func.count().filter(Note.deleted_at == None),
+            func.count().filter(Note.deleted_at != None),
+        )
+        .where(Note.created_by != None)
+        .group_by(Note.created_by)
+    )
+    stmt = insert(UserNoteStats).from_select(
+        ["user_id", "active_notes", "deleted_notes"], counts
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserNoteStats.user_id],
+        set_={
+            "active_notes": stmt.excluded.active_notes,
+            "deleted_notes": stmt.excluded.deleted_notes,
+            "version": UserNoteStats.version + 1,
+        },
+    )
+    await session.execute(stmt)
+
+    stale = await session.execute(
+        update(UserNoteStats)
+        .where(
+            UserNoteStats.user_id.not_in(
+                select(Note.created_by).where(Note.created_by != None)
+            )
+        )
+        .values(
+            active_notes=0, deleted_notes=0, version=UserNoteStats.version + 1
+        )
+    )
+    logger.info("note stats reconciled, %s stale counters reset", stale.rowcount)
+
+
+async def run_note_stats_reconciliation() -> None:
+    async with AsyncSessionLocal.begin() as session:
+        await reconcile_note_stats(session)
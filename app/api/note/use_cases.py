@@ -1,18 +1,85 @@
+import csv
 import datetime
-import math
-from typing import Annotated
+import io
+import logging
+from typing import Annotated, AsyncIterator, Callable
 
 from fastapi import Depends, HTTPException
-
-from sqlalchemy import func, select
+from pydantic import BaseModel, ValidationError
+
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    String,
+    Text,
+    cast,
+    column,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import REAL, REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession as SQLAlchemyAsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from db import get_session
-from api.base.base_schemas import PaginationMetaResponse, PaginationParams
-from models.note import Note, NoteSchema
-from .schemas import AddNoteRequest, UpdateNoteRequest, GetAllNotesRequest
-
-AsyncSession = Annotated[async_sessionmaker, Depends(get_session)]
+from db import RequestSession, get_read_session, get_request_session, mark_user_write
+from api.base.base_schemas import (
+    CountMode,
+    PaginationMetaResponse,
+    PaginationParams,
+)
+from models.note import NOTE_SCHEMA_COLUMNS, SEARCH_CONFIG, Note, NoteSchema
+from models.user import User
+from settings import settings
+from utils.etag import make_etag
+from utils.fieldsets import parse_fields, partial_schema
+from utils.rows import rows_to_schema
+from utils.pagination import (
+    build_pagination_meta,
+    count_total,
+    decode_cursor,
+    encode_cursor,
+)
+from .cache import cache_note, get_cached_note, invalidate_notes
+from .events import NoteEvent, NoteEventType, publish_note_events
+from .importer import iter_import_records
+from .stats import (
+    get_note_listing_version,
+    get_note_stats,
+    lock_note_stats,
+    settle_note_changes,
+    update_note_stats,
+)
+from .schemas import (
+    AddNoteRequest,
+    UpdateNoteRequest,
+    GetAllNotesRequest,
+    NoteBatchItemResult,
+    NoteChanges,
+    NoteChangesRequest,
+    NoteBatchRequest,
+    NoteBatchResult,
+    NoteFilterParams,
+    ExportFormat,
+    ExportNotesRequest,
+    ImportNoteRow,
+    NoteImportError,
+    NoteImportReport,
+    NoteTombstone,
+    SearchNotesRequest,
+)
+
+logger = logging.getLogger(__name__)
+
+AsyncSession = Annotated[RequestSession, Depends(get_request_session)]
+# replicas when configured, see get_read_session
+ReadSession = Annotated[async_sessionmaker, Depends(get_read_session)]
+
+EXPORT_CHUNK_SIZE = 1000
 
 class AddNewNote:
     def __init__(self, session: AsyncSession) -> None:
@@ -20,18 +87,62 @@ class AddNewNote:
 
     async def execute(self, request: AddNoteRequest, user_id: int) -> NoteSchema:
         async with self.async_session.begin() as session:
+            now = await lock_note_stats(session, user_id)
+
             note = Note()
             note.title = request.title
             note.content = request.content
             note.created_by = user_id
             note.updated_by = user_id
-            note.created_at = datetime.datetime.utcnow()
-            note.updated_at = datetime.datetime.utcnow()
+            note.created_at = now
+            note.updated_at = now
 
             session.add(note)
             await session.flush()
+            await update_note_stats(session, user_id, active_delta=1)
+            note = NoteSchema.from_orm(note)
+
+        async def committed() -> None:
+            mark_user_write(user_id)
+            await publish_note_events(NoteEvent(type=NoteEventType.CREATED, note=note))
+
+        await self.async_session.after_commit(committed)
+
+        return note
+
+async def note_access_error(
+    session: SQLAlchemyAsyncSession, note_id: int
+) -> HTTPException:
+    """Tell apart a missing note (404) from someone else's note (401)."""
+    note = await session.execute(
+        select(Note.note_id).where(
+            (Note.note_id == note_id).__and__(Note.deleted_at == None)
+        )
+    )
+    if note.first() is None:
+        return HTTPException(status_code=404, detail="note not found")
+
+    return HTTPException(status_code=401, detail="not valid credentials")
+
+
+def owned_note_clause(user_id: int, note_id: int) -> ColumnElement[bool]:
+    return (
+        (Note.note_id == note_id)
+        .__and__(Note.created_by == user_id)
+        .__and__(Note.deleted_at == None)
+    )
+
+
+def note_filters(params: NoteFilterParams, user_id: int) -> list[ColumnElement[bool]]:
+    filters = []
+    if params.filter_by_user_id:
+        filters.append(Note.created_by == user_id)
+
+    if not params.include_deleted_note:
+        filters.append(Note.deleted_at == None)
+
+    return filters
 
-            return NoteSchema.from_orm(note)
 
 class DeleteNote:
     def __init__(self, session: AsyncSession) -> None:
@@ -39,25 +150,32 @@ class DeleteNote:
 
     async def execute(self, user_id: int, note_id: int) -> NoteSchema:
         async with self.async_session.begin() as session:
+            now = await lock_note_stats(session, user_id)
+            # updated_at moves too, so /notes/changes picks up the tombstone
             note = await session.execute(
-                select(Note).where(
-                    (Note.note_id == note_id).__and__(Note.deleted_at == None)
-                )
+                update(Note)
+                .where(owned_note_clause(user_id, note_id))
+                .values(deleted_at=now, updated_at=now, deleted_by=user_id)
+                .returning(*NOTE_SCHEMA_COLUMNS)
+                .execution_options(synchronize_session=False)
             )
-            note = note.scalars().first()
+            note = note.first()
 
             if not note:
-                raise HTTPException(status_code=404, detail="note not found")
+                raise await note_access_error(session, note_id)
 
-            if note.created_by != user_id:
-                raise HTTPException(status_code=401, detail="not valid credentials")
+            await update_note_stats(session, user_id, active_delta=-1, deleted_delta=1)
 
-            note.deleted_at = datetime.datetime.utcnow()
-            note.deleted_by = user_id
+        note = NoteSchema.from_orm(note)
 
-            await session.flush()
+        async def committed() -> None:
+            await invalidate_notes(note_id)
+            mark_user_write(user_id)
+            await publish_note_events(NoteEvent(type=NoteEventType.DELETED, note=note))
 
-            return NoteSchema.from_orm(note)
+        await self.async_session.after_commit(committed)
+
+        return note
 
 class UpdateNote:
     def __init__(self, session: AsyncSession) -> None:
@@ -65,92 +183,547 @@ class UpdateNote:
 
     async def execute(self, request: UpdateNoteRequest, user_id: int, note_id: int) -> NoteSchema:
         async with self.async_session.begin() as session:
+            now = await lock_note_stats(session, user_id)
             note = await session.execute(
-                select(Note).where(
-                    (Note.note_id == note_id).__and__(Note.deleted_at == None)
+                update(Note)
+                .where(owned_note_clause(user_id, note_id))
+                .values(
+                    title=request.title,
+                    content=request.content,
+                    updated_at=now,
+                    updated_by=user_id,
                 )
+                .returning(*NOTE_SCHEMA_COLUMNS)
+                .execution_options(synchronize_session=False)
             )
-            note = note.scalars().first()
+            note = note.first()
 
             if not note:
-                raise HTTPException(status_code=404, detail="note not found")
-            
-            if note.created_by != user_id:
-                raise HTTPException(status_code=401, detail="not valid credentials")
+                raise await note_access_error(session, note_id)
 
-            note.title = request.title
-            note.content = request.content
-            note.updated_at = datetime.datetime.utcnow()
-            note.updated_by = user_id
+            # no counter change, but the listing version moves
+            await update_note_stats(session, user_id)
 
-            await session.flush()
+        note = NoteSchema.from_orm(note)
 
-            return NoteSchema.from_orm(note)
+        async def committed() -> None:
+            await invalidate_notes(note_id)
+            mark_user_write(user_id)
+            await publish_note_events(NoteEvent(type=NoteEventType.UPDATED, note=note))
+
+        await self.async_session.after_commit(committed)
+
+        return note
         
+class BatchNotes:
+    def __init__(self, session: AsyncSession) -> None:
+        self.async_session = session
+
+    async def execute(self, request: NoteBatchRequest, user_id: int) -> NoteBatchResult:
+        async with self.async_session.begin() as session:
+            now = await lock_note_stats(session, user_id)
+
+            created = []
+            if request.create:
+                notes = await session.execute(
+                    insert(Note)
+                    .values(
+                        [
+                            {
+                                "title": item.title,
+                                "content": item.content,
+                                "created_by": user_id,
+                                "updated_by": user_id,
+                                "created_at": now,
+                                "updated_at": now,
+                            }
+                            for item in request.create
+                        ]
+                    )
+                    .returning(*NOTE_SCHEMA_COLUMNS)
+                )
+                created = [
+                    NoteBatchItemResult(note_id=n.note_id, data=NoteSchema.from_orm(n))
+                    for n in notes
+                ]
+
+            updated = {}
+            if request.update:
+                batch = values(
+                    column("note_id", Integer),
+                    column("title", String),
+                    column("content", Text),
+                    name="batch",
+                ).data([(i.note_id, i.title, i.content) for i in request.update])
+                notes = await session.execute(
+                    update(Note)
+                    .where(
+                        (Note.note_id == batch.c.note_id)
+                        .__and__(Note.created_by == user_id)
+                        .__and__(Note.deleted_at == None)
+                    )
+                    .values(
+                        title=batch.c.title,
+                        content=batch.c.content,
+                        updated_at=now,
+                        updated_by=user_id,
+                    )
+                    .returning(*NOTE_SCHEMA_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                )
+                updated = {n.note_id: NoteSchema.from_orm(n) for n in notes}
+
+            deleted = {}
+            if request.delete:
+                notes = await session.execute(
+                    update(Note)
+                    .where(
+                        (Note.note_id.in_(request.delete))
+                        .__and__(Note.created_by == user_id)
+                        .__and__(Note.deleted_at == None)
+                    )
+                    .values(deleted_at=now, updated_at=now, deleted_by=user_id)
+                    .returning(*NOTE_SCHEMA_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                )
+                deleted = {n.note_id: NoteSchema.from_orm(n) for n in notes}
+
+            # one lookup resolves 404 vs 401 for every operation that matched nothing
+            missing = [i.note_id for i in request.update if i.note_id not in updated]
+            missing += [note_id for note_id in request.delete if note_id not in deleted]
+            not_owned = set()
+            if missing:
+                notes = await session.execute(
+                    select(Note.note_id).where(
+                        (Note.note_id.in_(missing)).__and__(Note.deleted_at == None)
+                    )
+                )
+                not_owned = set(notes.scalars().all())
+
+            def item_result(note_id: int, done: dict) -> NoteBatchItemResult:
+                if note_id in done:
+                    return NoteBatchItemResult(note_id=note_id, data=done[note_id])
+                if note_id in not_owned:
+                    return NoteBatchItemResult(
+                        note_id=note_id, status="error", message="not valid credentials"
+                    )
+                return NoteBatchItemResult(
+                    note_id=note_id, status="error", message="note not found"
+                )
+
+            if created or updated or deleted:
+                await update_note_stats(
+                    session,
+                    user_id,
+                    active_delta=len(created) - len(deleted),
+                    deleted_delta=len(deleted),
+                )
+
+            result = NoteBatchResult(
+                create=created,
+                update=[item_result(i.note_id, updated) for i in request.update],
+                delete=[item_result(note_id, deleted) for note_id in request.delete],
+            )
+
+        async def committed() -> None:
+            await invalidate_notes(*updated, *deleted)
+            mark_user_write(user_id)
+            await publish_note_events(
+                *(NoteEvent(type=NoteEventType.CREATED, note=c.data) for c in created),
+                *(NoteEvent(type=NoteEventType.UPDATED, note=n) for n in updated.values()),
+                *(NoteEvent(type=NoteEventType.DELETED, note=n) for n in deleted.values()),
+            )
+
+        await self.async_session.after_commit(committed)
+
+        return result
+
+def note_etag(note_id: int, updated_at: datetime.datetime | None) -> str:
+    return make_etag("note", note_id, updated_at)
+
+
 class GetNote:
+    # on the primary: fills the note cache, which must not keep replica lag
     def __init__(self, session: AsyncSession) -> None:
         self.async_session = session
 
+    async def etag(self, user_id: int, note_id: int) -> str | None:
+        """
+        Current ETag of a note readable by user_id, from the cache or a two column
+        lookup; None when execute would fail, so the caller falls through to it.
+        """
+        note = await get_cached_note(note_id)
+        if note is None:
+            async with self.async_session() as session:
+                note = await session.execute(
+                    select(Note.created_by, Note.updated_at).where(
+                        (Note.note_id == note_id).__and__(Note.deleted_at == None)
+                    )
+                )
+                note = note.first()
+
+        if note is None or note.created_by != user_id:
+            return None
+
+        return note_etag(note_id, note.updated_at)
+
     async def execute(self, user_id: int, note_id: int) -> NoteSchema:
-        async with self.async_session() as session:
-            note = await session.execute(
-                select(Note).where(
-                    (Note.note_id == note_id).__and__(Note.deleted_at == None)
+        note = await get_cached_note(note_id)
+        if note is None:
+            async with self.async_session() as session:
+                note = await session.execute(
+                    select(*NOTE_SCHEMA_COLUMNS).where(
+                        (Note.note_id == note_id).__and__(Note.deleted_at == None)
+                    )
                 )
-            )
-            note = note.scalars().first()
+                note = note.first()
 
-            if not note:
-                raise HTTPException(status_code=404, detail="note not found")
-            
-            if note.created_by != user_id:
-                raise HTTPException(status_code=401, detail="not valid credentials")
+                if not note:
+                    raise HTTPException(status_code=404, detail="note not found")
 
-            return NoteSchema.from_orm(note)
+                note = NoteSchema.from_orm(note)
+                await cache_note(note)
+
+        if note.created_by != user_id:
+            raise HTTPException(status_code=401, detail="not valid credentials")
+
+        return note
 
 class GetAllNotes:
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: ReadSession) -> None:
         self.async_session = session
 
+    async def etag(self, page_params: GetAllNotesRequest, user_id: int) -> str | None:
+        """
+        ETag of the user's own listing, from the per-user version bumped by every
+        note write; None for listings across users, which have no such version.
+        Read it before the listing so a concurrent write can only make it stale.
+        """
+        if not page_params.filter_by_user_id:
+            return None
+
+        async with self.async_session() as session:
+            version = await get_note_listing_version(session, user_id)
+
+        return make_etag("notes", user_id, version, page_params.json())
+
     async def execute(
         self,
         page_params: GetAllNotesRequest,
         user_id: int
-    ) -> (list[NoteSchema], PaginationMetaResponse):
+    ) -> (list[BaseModel], PaginationMetaResponse):
         async with self.async_session() as session:
+            filters = note_filters(page_params, user_id)
+
+            # sparse fieldset: select only the requested columns (plus the keyset)
+            fields = parse_fields(NoteSchema, page_params.fields)
+            note_schema, columns = NoteSchema, NOTE_SCHEMA_COLUMNS
+            if fields is not None:
+                note_schema = partial_schema(NoteSchema, fields)
+                keyset = ("created_at", "note_id") if page_params.use_cursor else ()
+                columns = tuple(
+                    getattr(Note, name) for name in dict.fromkeys((*fields, *keyset))
+                )
+
+            # fetch one extra row to know whether a next page exists without counting
             page_query = (
-                select(Note)
-                .offset((page_params.page - 1) * page_params.item_per_page)
-                .limit(page_params.item_per_page)
+                select(*columns)
+                .filter(*filters)
+                .limit(page_params.item_per_page + 1)
             )
+            if page_params.use_cursor:
+                # keyset on (created_at, note_id): deep pages cost the same as the first
+                page_query = page_query.order_by(
+                    Note.created_at.desc(), Note.note_id.desc()
+                )
+                if page_params.after is not None:
+                    after_created_at, after_note_id = decode_cursor(
+                        page_params.after, datetime.datetime, int
+                    )
+                    page_query = page_query.filter(
+                        tuple_(Note.created_at, Note.note_id)
+                        < tuple_(after_created_at, after_note_id)
+                    )
+            else:
+                page_query = page_query.offset(
+                    (page_params.page - 1) * page_params.item_per_page
+                )
+
+            paginated_query = await session.execute(page_query)
+            paginated_query = paginated_query.all()
+
+            total_item = None
+            use_stats = page_params.count is not CountMode.NONE
+            if page_params.filter_by_user_id and use_stats:
+                # per-user counter: a primary key lookup instead of a count scan
+                stats = await get_note_stats(session, user_id)
+                if stats is not None:
+                    total_item = stats.active_notes
+                    if page_params.include_deleted_note:
+                        total_item += stats.deleted_notes
+
+            if total_item is None:
+                total_item = await count_total(
+                    session, select(Note.note_id).filter(*filters), page_params.count
+                )
+
+            has_next = len(paginated_query) > page_params.item_per_page
+            paginated_query = paginated_query[: page_params.item_per_page]
+
+            next_cursor = None
+            if page_params.use_cursor and has_next:
+                last = paginated_query[-1]
+                next_cursor = encode_cursor(last.created_at, last.note_id)
 
-            total_query = (
-                select(func.count())
-                .select_from(Note)
+            notes = rows_to_schema(note_schema, paginated_query)
+
+            meta = build_pagination_meta(page_params, total_item, has_next, next_cursor)
+
+            return notes, meta
+
+class GetNoteChanges:
+    # on the primary: replica lag could let the watermark pass unreplicated writes
+    def __init__(self, session: AsyncSession) -> None:
+        self.async_session = session
+
+    async def execute(self, params: NoteChangesRequest, user_id: int) -> NoteChanges:
+        async with self.async_session() as session:
+            # open writes of the user commit first and later ones are stamped after
+            # this read, so the watermark cannot move past an uncommitted write
+            await settle_note_changes(session, user_id)
+            query = (
+                select(*NOTE_SCHEMA_COLUMNS)
+                .where(Note.created_by == user_id)
+                .order_by(Note.updated_at, Note.note_id)
+                .limit(params.item_per_page + 1)
             )
+            if params.since is not None:
+                # keyset on (updated_at, note_id), every write moves updated_at
+                since_updated_at, since_note_id = decode_cursor(
+                    params.since, datetime.datetime, int
+                )
+                query = query.filter(
+                    tuple_(Note.updated_at, Note.note_id)
+                    > tuple_(since_updated_at, since_note_id)
+                )
 
-            if page_params.filter_by_user_id:
-                page_query = page_query.filter(Note.created_by == user_id)
-                total_query = total_query.filter(Note.created_by == user_id)
-            
-            if not page_params.include_deleted_note:
-                page_query = page_query.filter(Note.deleted_at == None)
-                total_query = total_query.filter(Note.deleted_at == None)
+            notes = await session.execute(query)
+            notes = notes.all()
+
+        has_more = len(notes) > params.item_per_page
+        notes = notes[: params.item_per_page]
+
+        watermark = params.since
+        if notes:
+            watermark = encode_cursor(notes[-1].updated_at, notes[-1].note_id)
+
+        return NoteChanges(
+            changes=rows_to_schema(
+                NoteSchema, (n for n in notes if n.deleted_at is None)
+            ),
+            deleted=[
+                NoteTombstone(note_id=n.note_id, deleted_at=n.deleted_at)
+                for n in notes
+                if n.deleted_at is not None
+            ],
+            watermark=watermark,
+            has_more=has_more,
+        )
+
+class SearchNotes:
+    def __init__(self, session: ReadSession) -> None:
+        self.async_session = session
 
-            paginated_query = await session.execute(page_query)
-            paginated_query = paginated_query.scalars().all()
-            
-            total_item = await session.execute(total_query)
-            total_item = total_item.scalar()
+    async def execute(
+        self,
+        params: SearchNotesRequest,
+        user_id: int,
+    ) -> (list[NoteSchema], PaginationMetaResponse):
+        async with self.async_session() as session:
+            ts_query = func.websearch_to_tsquery(
+                literal(SEARCH_CONFIG, REGCONFIG), params.q
+            )
+            rank = func.ts_rank_cd(Note.search_vector, ts_query)
+
+            query = (
+                select(*NOTE_SCHEMA_COLUMNS, rank.label("rank"))
+                .filter(Note.search_vector.bool_op("@@")(ts_query))
+                .filter(*note_filters(params, user_id))
+                .order_by(rank.desc(), Note.note_id.desc())
+                .limit(params.item_per_page + 1)
+            )
+            if params.after is not None:
+                # keyset on (rank, note_id), ts_rank_cd returns a real
+                after_rank, after_note_id = decode_cursor(params.after, float, int)
+                query = query.filter(
+                    tuple_(rank, Note.note_id)
+                    < tuple_(cast(after_rank, REAL), after_note_id)
+                )
+
+            notes = await session.execute(query)
+            notes = notes.all()
 
-            notes = [NoteSchema.from_orm(p) for p in paginated_query]
+            has_next = len(notes) > params.item_per_page
+            notes = notes[: params.item_per_page]
+
+            next_cursor = None
+            if has_next:
+                next_cursor = encode_cursor(notes[-1].rank, notes[-1].note_id)
 
             meta = PaginationMetaResponse(
-                total_item=total_item,
-                page=page_params.page,
-                item_per_page=page_params.item_per_page,
-                total_page=math.ceil(total_item / page_params.item_per_page),
+                total_item=None,
+                total_page=None,
+                item_per_page=params.item_per_page,
+                has_next=has_next,
+                next_cursor=next_cursor,
             )
 
-            return notes, meta
-        
\ No newline at end of file
+            return rows_to_schema(NoteSchema, notes), meta
+
+class ExportNotes:
+    def __init__(self, session: ReadSession) -> None:
+        self.async_session = session
+
+    async def execute(
+        self,
+        params: ExportNotesRequest,
+        user_id: int,
+    ) -> AsyncIterator[str]:
+        """Yield the export in chunks; rows come from a server-side cursor."""
+        async with self.async_session() as session:
+            notes = await session.stream(
+                select(*NOTE_SCHEMA_COLUMNS)
+                .filter(*note_filters(params, user_id))
+                .order_by(Note.note_id)
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+
+            if params.format is ExportFormat.CSV:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(NoteSchema.__fields__)
+                async for rows in notes.partitions():
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+            else:
+                async for rows in notes.partitions():
+                    yield "".join(
+                        n.json() + "\n" for n in rows_to_schema(NoteSchema, rows)
+                    )
+
+class ImportNotes:
+    def __init__(self, session: AsyncSession) -> None:
+        self.async_session = session
+
+    async def execute(
+        self,
+        chunks: AsyncIterator[bytes],
+        format: ExportFormat,
+        on_progress: Callable[[NoteImportReport], None] | None = None,
+    ) -> NoteImportReport:
+        """COPY rows chunk by chunk, collecting per-row errors instead of aborting."""
+        report = NoteImportReport()
+        rows: list[tuple[int, ImportNoteRow]] = []
+
+        async for row, record, error in iter_import_records(chunks, format):
+            if error is None:
+                try:
+                    rows.append((row, ImportNoteRow.parse_obj(record)))
+                except ValidationError as e:
+                    error = "; ".join(
+                        f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                        for err in e.errors()
+                    )
+            if error is not None:
+                self._add_error(report, row, error)
+
+            if len(rows) >= settings.NOTE_IMPORT_CHUNK_SIZE:
+                await self._copy_chunk(rows, report)
+                rows = []
+                if on_progress is not None:
+                    on_progress(report)
+
+        if rows:
+            await self._copy_chunk(rows, report)
+            if on_progress is not None:
+                on_progress(report)
+
+        return report
+
+    def _add_error(self, report: NoteImportReport, row: int, message: str) -> None:
+        report.failed += 1
+        if len(report.errors) < settings.NOTE_IMPORT_MAX_ERRORS:
+            report.errors.append(NoteImportError(row=row, message=message))
+        else:
+            report.errors_truncated = True
+
+    async def _copy_chunk(
+        self, rows: list[tuple[int, ImportNoteRow]], report: NoteImportReport
+    ) -> None:
+        try:
+            async with self.async_session.begin() as session:
+                # also opens the transaction on the driver connection before COPY
+                users = await session.execute(
+                    select(User.user_id).where(
+                        User.user_id.in_({r.created_by for _, r in rows})
+                    )
+                )
+                users = set(users.scalars().all())
+
+                now = await lock_note_stats(
+                    session, *{r.created_by for _, r in rows if r.created_by in users}
+                )
+                records = []
+                rejected = []
+                note_counts: dict[int, int] = {}
+                for row, note in rows:
+                    if note.created_by not in users:
+                        rejected.append((row, note.created_by))
+                        continue
+                    # updated_at is the import time even for a past created_at,
+                    # or /notes/changes would sort the note behind held watermarks
+                    records.append(
+                        (
+                            note.title,
+                            note.content,
+                            note.created_at or now,
+                            now,
+                            note.created_by,
+                            note.created_by,
+                        )
+                    )
+                    note_counts.setdefault(note.created_by, 0)
+                    note_counts[note.created_by] += 1
+
+                if records:
+                    conn = await session.connection()
+                    raw_conn = await conn.get_raw_connection()
+                    await raw_conn.driver_connection.copy_records_to_table(
+                        Note.__tablename__,
+                        records=records,
+                        columns=[
+                            "title",
+                            "content",
+                            "created_at",
+                            "updated_at",
+                            "created_by",
+                            "updated_by",
+                        ],
+                    )
+
+                for user_id, count in note_counts.items():
+                    await update_note_stats(session, user_id, active_delta=count)
+
+            report.imported += len(records)
+            for row, user_id in rejected:
+                self._add_error(
+                    report, row, f"created_by: user {user_id} does not exist"
+                )
+        except Exception as e:
+            logger.exception("failed to import note chunk")
+            for row, _ in rows:
+                self._add_error(report, row, f"chunk failed: {e}")
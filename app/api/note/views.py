@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, Path, Request, Response, HTTPException
+from fastapi import APIRouter, Depends, Header, Path, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from api.base.base_schemas import BaseResponse, PaginationParams
-from middlewares.authentication import get_user_id_from_access_token
+from middlewares.authentication import get_admin_user_id, get_user_id_from_access_token
+from utils.etag import etag_matches
+from utils.responses import model_response
 
+from .events import note_event_stream
 from .schemas import (
     AddNoteRequest,
     AddNoteResponse,
@@ -10,14 +14,28 @@ from .schemas import (
     GetNoteResponse,
     GetAllNotesRequest,
     GetAllNotesResponse,
-    NotePaginationResponse
+    NotePaginationResponse,
+    NoteBatchRequest,
+    NoteBatchResponse,
+    NoteChangesRequest,
+    NoteChangesResponse,
+    ExportFormat,
+    ExportNotesRequest,
+    NoteImportResponse,
+    SearchNotesRequest,
 )
 from .use_cases import (
     AddNewNote,
     DeleteNote,
     UpdateNote,
     GetNote,
-    GetAllNotes
+    GetAllNotes,
+    GetNoteChanges,
+    note_etag,
+    BatchNotes,
+    ExportNotes,
+    ImportNotes,
+    SearchNotes,
 )
 
 router = APIRouter(prefix="/notes")
@@ -57,6 +75,84 @@ async def add_new_note(
             message=message
         )
 
+@router.post(":batch", response_model=NoteBatchResponse, tags=[tag])
+async def batch_notes(
+    response: Response,
+    body: NoteBatchRequest,
+    user_id: int = Depends(get_user_id_from_access_token),
+    batch: BatchNotes = Depends(BatchNotes),
+) -> NoteBatchResponse:
+    """
+    Create, update and delete several notes in one transaction.
+    Every operation gets its own result; an update or delete of a missing or
+    foreign note is reported in its result and does not abort the batch.
+    """
+    try:
+        resp_data = await batch.execute(request=body, user_id=user_id)
+
+        return NoteBatchResponse(
+            status="success",
+            message="success run note batch",
+            data=resp_data
+        )
+    except HTTPException as ex:
+        response.status_code = ex.status_code
+        return NoteBatchResponse(
+            status="error",
+            message=ex.detail
+        )
+    except Exception as e:
+        response.status_code = 500
+        message = "failed to run note batch"
+        if hasattr(e, "message"):
+            message = e.message
+        elif hasattr(e, "detail"):
+            message = e.detail
+
+        return NoteBatchResponse(
+            status="error",
+            message=message
+        )
+
+@router.post("/import", response_model=NoteImportResponse, tags=[tag])
+async def import_notes(
+    request: Request,
+    response: Response,
+    format: ExportFormat = ExportFormat.NDJSON,
+    admin_user_id: int = Depends(get_admin_user_id),
+    import_notes: ImportNotes = Depends(ImportNotes),
+) -> NoteImportResponse:
+    """
+    Admin only. Load notes from an NDJSON or CSV request body with COPY,
+    every row needs title, content and created_by; created_at is optional
+    """
+    try:
+        resp_data = await import_notes.execute(chunks=request.stream(), format=format)
+
+        return NoteImportResponse(
+            status="success",
+            message="success import notes",
+            data=resp_data
+        )
+    except HTTPException as ex:
+        response.status_code = ex.status_code
+        return NoteImportResponse(
+            status="error",
+            message=ex.detail
+        )
+    except Exception as e:
+        response.status_code = 500
+        message = "failed to import notes"
+        if hasattr(e, "message"):
+            message = e.message
+        elif hasattr(e, "detail"):
+            message = e.detail
+
+        return NoteImportResponse(
+            status="error",
+            message=message
+        )
+
 @router.delete("/{note_id}", response_model=BaseResponse, tags=[tag])
 async def delete_note(
     response: Response,
@@ -124,20 +220,149 @@ async def update_note(
             message=message
         )
 
+@router.get("/search", response_model=GetAllNotesResponse, tags=[tag])
+async def search_notes(
+    response: Response,
+    user_id: int = Depends(get_user_id_from_access_token),
+    params: SearchNotesRequest = Depends(),
+    search: SearchNotes = Depends(SearchNotes),
+) -> GetAllNotesResponse:
+    """
+    Full-text search on title and content, best match first.
+    Page with meta.next_cursor passed back as after
+    """
+    try:
+        resp_data = await search.execute(params=params, user_id=user_id)
+
+        return model_response(
+            GetAllNotesResponse.construct(
+                status="success",
+                message="success search notes",
+                data=NotePaginationResponse.construct(
+                    records=resp_data[0], meta=resp_data[1]
+                ),
+            )
+        )
+    except HTTPException as ex:
+        response.status_code = ex.status_code
+        return GetAllNotesResponse(
+            status="error",
+            message=ex.detail
+        )
+    except Exception as e:
+        response.status_code = 500
+        message = "failed to search notes"
+        if hasattr(e, "message"):
+            message = e.message
+        elif hasattr(e, "detail"):
+            message = e.detail
+
+        return GetAllNotesResponse(
+            status="error",
+            message=message
+        )
+
+@router.get("/export", response_class=StreamingResponse, tags=[tag])
+async def export_notes(
+    user_id: int = Depends(get_user_id_from_access_token),
+    params: ExportNotesRequest = Depends(),
+    export: ExportNotes = Depends(ExportNotes),
+) -> StreamingResponse:
+    """
+    Stream every note matching the listing filters as NDJSON or CSV,
+    memory use does not depend on the number of notes
+    """
+    media_type = "application/x-ndjson"
+    if params.format is ExportFormat.CSV:
+        media_type = "text/csv"
+
+    return StreamingResponse(
+        export.execute(params=params, user_id=user_id),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="notes.{params.format.value}"'
+        },
+    )
+
+@router.get("/events", response_class=StreamingResponse, tags=[tag])
+async def note_events(
+    user_id: int = Depends(get_user_id_from_access_token),
+) -> StreamingResponse:
+    """
+    Server-sent events (created, updated, deleted) for the token user's notes.
+    On a resync event, catch up with /notes/changes and reconnect
+    """
+    return StreamingResponse(
+        note_event_stream(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/changes", response_model=NoteChangesResponse, tags=[tag])
+async def get_note_changes(
+    response: Response,
+    user_id: int = Depends(get_user_id_from_access_token),
+    params: NoteChangesRequest = Depends(),
+    get_changes: GetNoteChanges = Depends(GetNoteChanges),
+) -> NoteChangesResponse:
+    """
+    Notes of the token user created, updated or deleted after the since watermark,
+    oldest change first. Keep the returned watermark for the next call and repeat
+    while has_more
+    """
+    try:
+        resp_data = await get_changes.execute(params=params, user_id=user_id)
+
+        return model_response(
+            NoteChangesResponse.construct(
+                status="success",
+                message="success get note changes",
+                data=resp_data,
+            )
+        )
+    except HTTPException as ex:
+        response.status_code = ex.status_code
+        return NoteChangesResponse(
+            status="error",
+            message=ex.detail
+        )
+    except Exception as e:
+        response.status_code = 500
+        message = "failed to get note changes"
+        if hasattr(e, "message"):
+            message = e.message
+        elif hasattr(e, "detail"):
+            message = e.detail
+
+        return NoteChangesResponse(
+            status="error",
+            message=message
+        )
+
 @router.get("/{note_id}", response_model=GetNoteResponse, tags=[tag])
 async def get_note(
     response: Response,
     note_id: int = Path(..., description=""),
+    if_none_match: str | None = Header(default=None),
     user_id: int = Depends(get_user_id_from_access_token),
     get_note: GetNote = Depends(GetNote),
 ) -> GetNoteResponse:
     try:
+        if if_none_match:
+            # revalidation only needs the version columns, not the note itself
+            etag = await get_note.etag(user_id=user_id, note_id=note_id)
+            if etag is not None and etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag})
+
         resp_data = await get_note.execute(user_id=user_id, note_id=note_id)
 
-        return GetNoteResponse(
-            status="success",
-            message="success get note",
-            data=resp_data
+        return model_response(
+            GetNoteResponse.construct(
+                status="success",
+                message="success get note",
+                data=resp_data,
+            ),
+            headers={"ETag": note_etag(resp_data.note_id, resp_data.updated_at)},
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
@@ -161,19 +386,30 @@ async def get_note(
 @router.get("", response_model=GetAllNotesResponse, tags=[tag])
 async def get_all_notes(
     response: Response,
+    if_none_match: str | None = Header(default=None),
     user_id: int = Depends(get_user_id_from_access_token),
     page_params: GetAllNotesRequest = Depends(),
     get_all: GetAllNotes = Depends(GetAllNotes),
 ) -> GetAllNotesResponse:
     try:
+        etag = await get_all.etag(page_params=page_params, user_id=user_id)
+        if etag is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
         resp_data = await get_all.execute(
             page_params=page_params, user_id=user_id
         )
 
-        return GetAllNotesResponse(
-            status="success",
-            message="success get all notes",
-            data=NotePaginationResponse(records=resp_data[0], meta=resp_data[1])
+        # records and meta are validated already (sparse ones as partial models)
+        return model_response(
+            GetAllNotesResponse.construct(
+                status="success",
+                message="success get all notes",
+                data=NotePaginationResponse.construct(
+                    records=resp_data[0], meta=resp_data[1]
+                ),
+            ),
+            headers={"ETag": etag} if etag is not None else None,
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
@@ -0,0 +1,37 @@
+from models.user import UserSchema
+from settings import settings
+from utils.cache import SingleFlight, TTLCache
+from utils.metrics import register_metrics
+
+# UserSchema by user_id for ReadUser; per process, so other workers may serve
+# a profile for up to USER_CACHE_TTL_SECONDS after it changed
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+user_fetches = SingleFlight()
+register_metrics(
+    "user_cache", lambda: {**user_cache.stats(), "collapsed": user_fetches.shared}
+)
+
+
+def cache_user(user: UserSchema) -> None:
+    """Fill the cache after a miss; never replaces an entry or a tombstone."""
+    user_cache.add(user.user_id, user)
+
+
+def get_cached_user(user_id: int) -> UserSchema | None:
+    # a tombstone is stored as None and reads as a miss
+    return user_cache.get(user_id)
+
+
+def invalidate_users(*user_ids: int) -> None:
+    """
+    Drop profiles from the cache; call it once the writing transaction committed.
+    The tombstone left for USER_CACHE_TOMBSTONE_SECONDS refuses fills, so a read
+    that loaded the profile before the write cannot put the old version back, and
+    later misses run their own query instead of joining one started before.
+    """
+    for user_id in user_ids:
+        user_cache.set(user_id, None, ttl=settings.USER_CACHE_TOMBSTONE_SECONDS)
+        user_fetches.forget(user_id)
@@ -15,7 +15,7 @@ class UserPaginationResponse(BaseModel):
 
 
 class ReadAllUserResponse(BaseResponse):
-    data: UserPaginationResponse
+    data: UserPaginationResponse | None
 
 
 class UpdateUserRequest(BaseModel):
@@ -1,67 +1,155 @@
 import datetime
-import math
 from typing import Annotated
 
 from fastapi import Depends, HTTPException
+from pydantic import BaseModel
 
-from sqlalchemy import func, select
+from sqlalchemy import any_, func, or_, select
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from db import get_session
+from db import RequestSession, get_read_session, get_request_session, mark_user_write
 from api.base.base_schemas import PaginationMetaResponse, PaginationParams
-from models.user import User, UserSchema
+from models.user import USER_SCHEMA_COLUMNS, User, UserSchema
+from utils.fieldsets import parse_fields, partial_schema
+from utils.rows import rows_to_schema
+from utils.pagination import build_pagination_meta, count_total
+from .cache import cache_user, get_cached_user, invalidate_users, user_fetches
 from .schemas import (
     UpdateUserRequest,
 )
 
-AsyncSession = Annotated[async_sessionmaker, Depends(get_session)]
+AsyncSession = Annotated[RequestSession, Depends(get_request_session)]
+# replicas when configured, see get_read_session
+ReadSession = Annotated[async_sessionmaker, Depends(get_read_session)]
+
+USER_BATCH_MAX_IDS = 100
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 class ReadAllUser:
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: ReadSession) -> None:
         self.async_session = session
 
     async def execute(
         self,
         page_params: PaginationParams,
         include_deactivated: bool,
-    ) -> (list[UserSchema], PaginationMetaResponse):
+        search: str | None = None,
+        fields: str | None = None,
+    ) -> (list[BaseModel], PaginationMetaResponse):
         async with self.async_session() as session:
-            total_item = await session.execute(
-                select(func.count())
-                .select_from(User)
-                .where(User.deactivated_at == None)
-            )
-            total_item = total_item.scalar()
+            filters = []
+            if not include_deactivated:
+                filters.append(User.deactivated_at == None)
+
+            # sparse fieldset: select only the requested columns
+            user_schema, columns = UserSchema, USER_SCHEMA_COLUMNS
+            fields = parse_fields(UserSchema, fields)
+            if fields is not None:
+                user_schema = partial_schema(UserSchema, fields)
+                columns = tuple(getattr(User, name) for name in fields)
+
+            query = select(*columns)
+            if search:
+                # substring or fuzzy match, both served by the pg_trgm GIN indexes
+                pattern = f"%{escape_like(search)}%"
+                columns = (User.username, User.email, User.name)
+                filters.append(
+                    or_(
+                        *(c.ilike(pattern, escape="\\") for c in columns),
+                        *(c.bool_op("%")(search) for c in columns),
+                    )
+                )
+                similarity = func.greatest(
+                    *(func.similarity(c, search) for c in columns)
+                )
+                query = query.order_by(similarity.desc(), User.user_id)
 
             query = (
-                select(User)
+                query.filter(*filters)
                 .offset((page_params.page - 1) * page_params.item_per_page)
-                .limit(page_params.item_per_page)
+                .limit(page_params.item_per_page + 1)
             )
-            if not include_deactivated:
-                query = query.filter(User.deactivated_at == None)
 
             paginated_query = await session.execute(query)
-            paginated_query = paginated_query.scalars().all()
-
-            users = [UserSchema.from_orm(p) for p in paginated_query]
+            paginated_query = paginated_query.all()
 
-            meta = PaginationMetaResponse(
-                total_item=total_item,
-                page=page_params.page,
-                item_per_page=page_params.item_per_page,
-                total_page=math.ceil(total_item / page_params.item_per_page),
+            total_item = await count_total(
+                session, select(User.user_id).filter(*filters), page_params.count
             )
 
+            has_next = len(paginated_query) > page_params.item_per_page
+            paginated_query = paginated_query[: page_params.item_per_page]
+
+            users = rows_to_schema(user_schema, paginated_query)
+
+            meta = build_pagination_meta(page_params, total_item, has_next)
+
             return users, meta
 
 
+class ReadUsersByIds:
+    # on the primary: fills the profile cache, which must not keep replica lag
+    def __init__(self, session: AsyncSession) -> None:
+        self.async_session = session
+
+    async def execute(
+        self,
+        user_ids: list[int],
+        include_deactivated: bool,
+        fields: str | None = None,
+    ) -> list[BaseModel]:
+        fields = parse_fields(UserSchema, fields)
+        user_ids = list(dict.fromkeys(user_ids))
+        if len(user_ids) > USER_BATCH_MAX_IDS:
+            raise HTTPException(400, f"at most {USER_BATCH_MAX_IDS} ids are allowed")
+
+        # the cache only holds active users, which every variant returns
+        users = {i: u for i in user_ids if (u := get_cached_user(i)) is not None}
+        missing = [i for i in user_ids if i not in users]
+        if missing:
+            async with self.async_session() as session:
+                filters = [User.user_id == any_(missing)]
+                if not include_deactivated:
+                    filters.append(User.deactivated_at == None)
+
+                result = await session.execute(
+                    select(*USER_SCHEMA_COLUMNS).filter(*filters)
+                )
+                for user in rows_to_schema(UserSchema, result):
+                    users[user.user_id] = user
+                    if user.deactivated_at is None:
+                        cache_user(user)
+
+        # unknown ids are left out, the rest keep the requested order
+        users = [users[i] for i in user_ids if i in users]
+        if fields is not None:
+            # full profiles are what the cache holds, narrow them for the payload
+            user_schema = partial_schema(UserSchema, fields)
+            users = [
+                user_schema.construct(**u.dict(include=set(fields))) for u in users
+            ]
+
+        return users
+
+
 class ReadUser:
+    # on the primary: fills the profile cache, which must not keep replica lag
     def __init__(self, session: AsyncSession) -> None:
         self.async_session = session
 
     async def execute(self, user_id: int) -> UserSchema:
+        user = get_cached_user(user_id)
+        if user is not None:
+            return user
+
+        # concurrent misses for the same id share one query
+        return await user_fetches.do(user_id, lambda: self.fetch(user_id))
+
+    async def fetch(self, user_id: int) -> UserSchema:
         async with self.async_session() as session:
             user = await session.execute(
                 select(User).where(
@@ -71,7 +159,10 @@ class ReadUser:
             user = user.scalars().first()
             if not user:
                 raise HTTPException(status_code=404)
-            return UserSchema.from_orm(user)
+
+            user = UserSchema.from_orm(user)
+            cache_user(user)
+            return user
 
 
 class UpdateUser:
@@ -116,7 +207,15 @@ class UpdateUser:
             user.updated_by = user_id
 
             await session.flush()
-            return UserSchema.from_orm(user)
+            resp_data = UserSchema.from_orm(user)
+
+        async def committed() -> None:
+            invalidate_users(user_id)
+            mark_user_write(user_id)
+
+        await self.async_session.after_commit(committed)
+
+        return resp_data
 
 
 class DeactivateUser:
@@ -142,5 +241,12 @@ class DeactivateUser:
             user.deactivated_by = user_id
 
             await session.flush()
+            resp_data = UserSchema.from_orm(user)
+
+        async def committed() -> None:
+            invalidate_users(user_id)
+            mark_user_write(user_id)
+
+        await self.async_session.after_commit(committed)
 
-            return UserSchema.from_orm(user)
+        return resp_data
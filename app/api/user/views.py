@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, Path, Request, Response, HTTPException
-from api.base.base_schemas import BaseResponse, PaginationParams
+from fastapi import APIRouter, Depends, Path, Query, Request, Response, HTTPException
+from api.base.base_schemas import BaseResponse, PaginationMetaResponse, PaginationParams
 from middlewares.authentication import get_user_id_from_access_token
+from utils.responses import model_response
 
 from .schemas import (
     ReadAllUserResponse,
@@ -9,7 +10,13 @@ from .schemas import (
     UpdateUserResponse,
     UserPaginationResponse,
 )
-from .use_cases import DeactivateUser, ReadAllUser, ReadUser, UpdateUser
+from .use_cases import (
+    DeactivateUser,
+    ReadAllUser,
+    ReadUser,
+    ReadUsersByIds,
+    UpdateUser,
+)
 
 router = APIRouter(prefix="/users")
 tag = "User"
@@ -21,18 +28,47 @@ async def read_all(
     response: Response,
     token_user_id: int = Depends(get_user_id_from_access_token),
     include_deactivated: bool = False,
+    search: str | None = Query(default=None, min_length=1, max_length=100),
+    ids: str | None = Query(default=None, regex=r"^\d+(,\d+)*$"),
+    fields: str | None = Query(
+        default=None, description="comma separated UserSchema fields to return"
+    ),
     page_params: PaginationParams = Depends(),
     read_all: ReadAllUser = Depends(ReadAllUser),
+    read_by_ids: ReadUsersByIds = Depends(ReadUsersByIds),
 ) -> ReadAllUserResponse:
+    """
+    List users; with search, only users whose username, email or name contains
+    or resembles the term, most similar first. With ids (comma separated), the
+    listed users in one query and in the given order, without pagination
+    """
     try:
-        resp_data = await read_all.execute(
-            page_params=page_params, include_deactivated=include_deactivated
-        )
-
-        return ReadAllUserResponse(
-            status="success",
-            message="success read users",
-            data=UserPaginationResponse(records=resp_data[0], meta=resp_data[1]),
+        if ids is not None:
+            records = await read_by_ids.execute(
+                user_ids=[int(i) for i in ids.split(",")],
+                include_deactivated=include_deactivated,
+                fields=fields,
+            )
+            meta = PaginationMetaResponse(
+                total_item=len(records),
+                item_per_page=len(records),
+                has_next=False,
+            )
+        else:
+            records, meta = await read_all.execute(
+                page_params=page_params,
+                include_deactivated=include_deactivated,
+                search=search,
+                fields=fields,
+            )
+
+        # records and meta are validated already (sparse ones as partial models)
+        return model_response(
+            ReadAllUserResponse.construct(
+                status="success",
+                message="success read users",
+                data=UserPaginationResponse.construct(records=records, meta=meta),
+            )
         )
     except HTTPException as ex:
         response.status_code = ex.status_code
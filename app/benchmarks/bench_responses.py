@@ -0,0 +1,102 @@
+"""
+CPU per response of the /notes listing payload, old path versus model_response.
+
+    APP_CONFIG_FILE=local python3 app/benchmarks/bench_responses.py [item_per_page]
+
+No database involved: the records are built in memory, so only the response
+building, validation and rendering done by the view and FastAPI are measured.
+"""
+import asyncio
+import datetime
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from api.base.base_schemas import PaginationMetaResponse  # noqa: E402
+from api.note.schemas import GetAllNotesResponse, NotePaginationResponse  # noqa: E402
+from models.note import NoteSchema  # noqa: E402
+from utils.responses import model_response  # noqa: E402
+
+ROUNDS = 2000
+
+
+def build_page(item_per_page: int) -> tuple[list[NoteSchema], PaginationMetaResponse]:
+    now = datetime.datetime.utcnow()
+    notes = [
+        NoteSchema(
+            note_id=i,
+            title=f"note {i}",
+            content="lorem ipsum dolor sit amet " * 15,
+            created_at=now,
+            updated_at=now,
+            deleted_at=None,
+            created_by=1,
+            updated_by=1,
+            deleted_by=None,
+        )
+        for i in range(item_per_page)
+    ]
+    meta = PaginationMetaResponse(
+        total_item=1000, item_per_page=item_per_page, page=1, total_page=10
+    )
+    return notes, meta
+
+
+async def validated(response_class, field, notes, meta) -> bytes:
+    # what the view did before: validating envelope, then FastAPI validates the
+    # returned model against response_model again and jsonable_encoder walks it
+    response = GetAllNotesResponse(
+        status="success",
+        message="success get all notes",
+        data=NotePaginationResponse(records=notes, meta=meta),
+    )
+    content = await serialize_response(field=field, response_content=response)
+    return response_class(content).body
+
+
+async def prevalidated(notes, meta) -> bytes:
+    return model_response(
+        GetAllNotesResponse.construct(
+            status="success",
+            message="success get all notes",
+            data=NotePaginationResponse.construct(records=notes, meta=meta),
+        )
+    ).body
+
+
+async def bench(name: str, make_body) -> None:
+    await make_body()
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        await make_body()
+    per_request = (time.process_time() - start) / ROUNDS * 1e6
+    print(f"{name:<40} {per_request:>9.1f} us/request")
+
+
+async def main(item_per_page: int) -> None:
+    notes, meta = build_page(item_per_page)
+    field = create_response_field(name="Response", type_=GetAllNotesResponse)
+    print(f"{item_per_page} notes per page, {ROUNDS} rounds")
+
+    await bench(
+        "validated + json (before)",
+        lambda: validated(JSONResponse, field, notes, meta),
+    )
+    await bench(
+        "validated + orjson",
+        lambda: validated(ORJSONResponse, field, notes, meta),
+    )
+    await bench(
+        "prevalidated + orjson (model_response)",
+        lambda: prevalidated(notes, meta),
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,80 @@
+"""
+CPU per listing page: ORM entities + from_orm versus projected rows + rows_to_schema.
+
+    APP_CONFIG_FILE=local python3 app/benchmarks/bench_rows.py [item_per_page]
+
+Runs against the configured database. The sample notes are inserted in a
+transaction that is rolled back at the end.
+"""
+import asyncio
+import datetime
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from db import AsyncSessionLocal, async_engine  # noqa: E402
+from models.note import NOTE_SCHEMA_COLUMNS, Note, NoteSchema  # noqa: E402
+from utils.rows import rows_to_schema  # noqa: E402
+
+ROUNDS = 300
+MARKER = "bench_rows"
+
+
+async def bench(name: str, load_page) -> None:
+    await load_page()
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        await load_page()
+    per_page = (time.process_time() - start) / ROUNDS * 1e6
+    print(f"{name:<40} {per_page:>9.1f} us/page")
+
+
+async def main(item_per_page: int) -> None:
+    async with AsyncSessionLocal() as session:
+        now = datetime.datetime.utcnow()
+        await session.execute(
+            insert(Note),
+            [
+                {
+                    "title": MARKER,
+                    "content": "lorem ipsum dolor sit amet " * 15,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for _ in range(item_per_page)
+            ],
+        )
+        page = Note.title == MARKER
+
+        async def entities() -> list[NoteSchema]:
+            notes = await session.execute(select(Note).filter(page))
+            notes = [NoteSchema.from_orm(n) for n in notes.scalars().all()]
+            # a listing session is discarded per request, keep the identity map
+            # from turning later rounds into cache hits
+            session.expunge_all()
+            return notes
+
+        async def projected_from_orm() -> list[NoteSchema]:
+            notes = await session.execute(select(*NOTE_SCHEMA_COLUMNS).filter(page))
+            return [NoteSchema.from_orm(n) for n in notes.all()]
+
+        async def projected() -> list[NoteSchema]:
+            notes = await session.execute(select(*NOTE_SCHEMA_COLUMNS).filter(page))
+            return rows_to_schema(NoteSchema, notes.all())
+
+        print(f"{item_per_page} notes per page, {ROUNDS} rounds")
+        await bench("select(Note) + from_orm (before)", entities)
+        await bench("projected rows + from_orm", projected_from_orm)
+        await bench("projected rows + rows_to_schema", projected)
+
+        await session.rollback()
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
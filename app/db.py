@@ -1,18 +1,103 @@
+import asyncio
+import contextlib
+import itertools
 import logging
-from typing import AsyncIterator
+import time
+from contextvars import ContextVar
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable
+from uuid import uuid4
 
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.engine import Dialect, ExceptionContext
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
+from middlewares.authentication import get_user_id_from_access_token
 from settings import settings
+from utils.cache import TTLCache
+from utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
-async_engine = create_async_engine(
-    settings.DB_DSN,
-    pool_pre_ping=True,
-    echo=False,
-)
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool recording how long checkouts take to get a connection,
+    including waiting for a free one and opening new ones, to size the pool.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def stats(self) -> dict[str, int | float]:
+        wait_avg = self.wait_seconds_total / self.checkouts if self.checkouts else 0
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(wait_avg * 1000, 3),
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+        }
+
+
+def create_engine(dsn: str) -> AsyncEngine:
+    # asyncpg's own statement cache and SQLAlchemy's prepared statement cache
+    connect_args = {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    if settings.DB_PGBOUNCER_MODE:
+        # transactions may run on different server connections: nothing cached,
+        # and the statements SQLAlchemy still prepares get unique names instead of
+        # the per connection __asyncpg_stmt_N__ ones, which clash across clients
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    return create_async_engine(
+        dsn,
+        poolclass=MeteredAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+        echo=False,
+    )
+
+
+async_engine = create_engine(settings.DB_DSN)
+# dispose() swaps in a new pool, read the current one at collection time
+register_metrics("db_pool", lambda: async_engine.pool.stats())
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     autoflush=False,
@@ -20,6 +105,129 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+class Replica:
+    """A read replica, ejected for a while after a connection level failure."""
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(bind=engine, autoflush=False)
+        self.ejected_until = 0.0
+        self.ejections = 0
+        event.listen(engine.sync_engine, "handle_error", self.on_error)
+        event.listen(engine.sync_engine, "do_connect", self.connect)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def eject(self) -> None:
+        logger.warning("ejecting read replica %s", self.engine.url)
+        self.ejected_until = time.monotonic() + settings.DB_REPLICA_EJECT_SECONDS
+        self.ejections += 1
+
+    def connect(self, dialect: Dialect, conn_rec, cargs: tuple, cparams: dict):
+        # refused or timed out connects surface as plain OSError, handle_error
+        # only sees DBAPI errors
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except (OSError, asyncio.TimeoutError):
+            self.eject()
+            raise
+
+    def on_error(self, context: ExceptionContext) -> None:
+        if context.is_disconnect:
+            self.eject()
+
+
+class RoutingSessionFactory:
+    """
+    Session factory for read-only use cases: sessions opened with () go to the
+    healthy replicas in turn (the primary when none is), begin() stays on the
+    primary so an accidental write never reaches a replica.
+    """
+
+    def __init__(self, primary: async_sessionmaker, replicas: list[Replica]) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.turn = itertools.count()
+
+    def __call__(self) -> AsyncSession:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self.turn) % len(self.replicas)]
+            if replica.healthy:
+                return replica.sessionmaker()
+
+        return self.primary()
+
+    def pin(self) -> "RoutingSessionFactory":
+        """
+        Factory bound to the next healthy replica (falling back to the primary),
+        so the reads of one request see one replica's state instead of several
+        replicas lagging by different amounts.
+        """
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self.turn) % len(self.replicas)]
+            if replica.healthy:
+                return RoutingSessionFactory(self.primary, [replica])
+
+        return RoutingSessionFactory(self.primary, [])
+
+    def begin(self) -> AsyncContextManager[AsyncSession]:
+        return self.primary.begin()
+
+    def stats(self) -> dict[str, dict[str, int | float | bool]]:
+        return {
+            r.engine.url.render_as_string(hide_password=True): {
+                "healthy": r.healthy,
+                "ejections": r.ejections,
+                **r.engine.pool.stats(),
+            }
+            for r in self.replicas
+        }
+
+
+read_session_factory = RoutingSessionFactory(
+    AsyncSessionLocal,
+    [Replica(create_engine(dsn)) for dsn in settings.DB_REPLICA_DSNS],
+)
+if read_session_factory.replicas:
+    register_metrics("db_replicas", read_session_factory.stats)
+
+# user_id of users who wrote recently, their reads stay on the primary until
+# replication has caught up; per process, other workers go by the cookie below
+recent_writers = TTLCache(
+    maxsize=100_000,
+    ttl=settings.DB_READ_YOUR_WRITES_SECONDS,
+)
+# epoch seconds until which the client's reads stay on the primary, set by
+# ReadYourWritesMiddleware on responses to writes
+READ_PRIMARY_COOKIE = "read_primary_until"
+# users who wrote during the current request, collected for that cookie
+request_writers: ContextVar[set[int] | None] = ContextVar(
+    "request_writers", default=None
+)
+
+
+def mark_user_write(user_id: int) -> None:
+    """Call it after a user's write committed, for read-your-writes."""
+    if read_session_factory.replicas:
+        recent_writers.set(user_id, True)
+        writers = request_writers.get()
+        if writers is not None:
+            writers.add(user_id)
+
+
+def reads_primary(request: Request, user_id: int) -> bool:
+    """Whether user_id is inside its read-your-writes window, on any worker."""
+    if recent_writers.get(user_id) is not None:
+        return True
+
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
 async def get_session() -> AsyncIterator[async_sessionmaker]:
     try:
         yield AsyncSessionLocal
@@ -27,12 +235,150 @@ async def get_session() -> AsyncIterator[async_sessionmaker]:
         logger.exception(e)
 
 
+class RequestSession:
+    """
+    Stand-in for a sessionmaker shared by the use cases of one request: () and
+    begin() hand out the same AsyncSession instead of a new one each. The session
+    is only created on first use, and like any session it checks out a connection
+    once it executes. Not for concurrent use within the request.
+    """
+
+    def __init__(self, factory: async_sessionmaker) -> None:
+        self.factory = factory
+        self.session: AsyncSession | None = None
+        self.unit_of_work: UnitOfWork | None = None
+        self.depth = 0
+
+    def get(self) -> AsyncSession:
+        if self.session is None:
+            self.session = self.factory()
+        return self.session
+
+    @contextlib.asynccontextmanager
+    async def __call__(self) -> AsyncIterator[AsyncSession]:
+        session = self.get()
+        self.depth += 1
+        try:
+            yield session
+        finally:
+            self.depth -= 1
+            # closing keeps the session reusable and hands the connection back,
+            # as leaving a sessionmaker session did
+            if self.depth == 0 and self.unit_of_work is None:
+                await session.close()
+
+    @contextlib.asynccontextmanager
+    async def begin(self) -> AsyncIterator[AsyncSession]:
+        session = self.get()
+        if self.unit_of_work is not None:
+            # one step of a unit of work: a savepoint, committed with the whole
+            async with session.begin_nested():
+                yield session
+            return
+
+        if session.in_transaction():
+            # end the transaction a read opened, this one is on its own
+            await session.commit()
+        async with self(), session.begin():
+            yield session
+
+    async def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        Run callback (cache invalidation, events) once the writes are committed:
+        now, or when the enclosing unit of work commits.
+        """
+        if self.unit_of_work is not None:
+            self.unit_of_work.callbacks.append(callback)
+        else:
+            await callback()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+
+class UnitOfWork:
+    """
+    One transaction across several use cases sharing a RequestSession. Their
+    begin() blocks become savepoints and their after_commit callbacks wait for
+    the final commit; an exception rolls everything back and drops them.
+
+        async with UnitOfWork(session):
+            note = await AddNewNote(session).execute(...)
+            await UpdateNote(session).execute(...)
+    """
+
+    def __init__(self, session: RequestSession) -> None:
+        self.request_session = session
+        self.callbacks: list[Callable[[], Awaitable[None]]] = []
+
+    async def __aenter__(self) -> "UnitOfWork":
+        if self.request_session.unit_of_work is not None:
+            raise RuntimeError("a unit of work is already active for this session")
+
+        session = self.request_session.get()
+        if session.in_transaction():
+            await session.commit()
+        await session.begin()
+        self.request_session.unit_of_work = self
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        session = self.request_session.get()
+        self.request_session.unit_of_work = None
+        try:
+            if exc_type is None:
+                await session.commit()
+            else:
+                await session.rollback()
+        finally:
+            await session.close()
+
+        if exc_type is None:
+            for callback in self.callbacks:
+                await callback()
+
+
+async def get_request_session(
+    session: async_sessionmaker = Depends(get_session),
+) -> AsyncIterator[RequestSession]:
+    """The request's RequestSession, closed once the response is sent."""
+    request_session = RequestSession(session)
+    try:
+        yield request_session
+    finally:
+        await request_session.close()
+
+
+async def get_read_session(
+    request: Request,
+    session: RequestSession = Depends(get_request_session),
+    user_id: int = Depends(get_user_id_from_access_token),
+) -> AsyncIterator[RequestSession | RoutingSessionFactory]:
+    """
+    Session factory for read-only use cases: one replica for the whole request
+    when configured, the primary for a user inside the read-your-writes window.
+    An overridden get_session (tests) is passed through untouched.
+    """
+    if (
+        session.factory is not AsyncSessionLocal
+        or not read_session_factory.replicas
+        or reads_primary(request, user_id)
+    ):
+        yield session
+    else:
+        yield read_session_factory.pin()
+
+
 async def ping_database():
     try:
         async with async_engine.begin():
             # Ping the database by executing a simple query
             pass
         logger.info("Database connection is active and responsive!")
+        # the ping runs on its own event loop, drop its connection so the server
+        # process opens a fresh pool on the loop that serves requests
+        await async_engine.dispose()
     except Exception as e:
         logger.exception("Error pinging database:", e)
         raise SystemExit(1)
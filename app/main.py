@@ -1,25 +1,114 @@
 import asyncio
+import importlib.util
+import os
 import sys
+from pathlib import Path
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from api.main import router as api_router
-from db import ping_database
+from api.note.events import note_event_listener
+from api.note.importer import read_file_chunks
+from api.note.schemas import ExportFormat, NoteImportReport
+from api.note.stats import run_note_stats_reconciliation
+from api.note.use_cases import ImportNotes
+from db import AsyncSessionLocal, async_engine, ping_database
+from middlewares.read_your_writes import ReadYourWritesMiddleware
 from migrations.migrate import migrate_database_tables
 from settings import settings
+from utils.password import password_hasher
 
 # move app object outside of __main__ so auto reload can be set
-app = FastAPI(title="BTJ Academy")
+app = FastAPI(title="BTJ Academy", default_response_class=ORJSONResponse)
 app.include_router(api_router, prefix="/api/v1")
+app.add_middleware(ReadYourWritesMiddleware)
+
+
+@app.on_event("startup")
+def start_note_event_listener() -> None:
+    if settings.NOTE_EVENTS_BRIDGE:
+        note_event_listener.start()
+
+
+@app.on_event("shutdown")
+async def stop_note_event_listener() -> None:
+    await note_event_listener.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher() -> None:
+    password_hasher.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_engine() -> None:
+    # runs after uvicorn drained in-flight requests, close pooled connections cleanly
+    await async_engine.dispose()
+
+
+def server_implementations() -> dict[str, str]:
+    """uvloop and httptools when installed, uvicorn's pure python ones otherwise."""
+    return {
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+    }
+
+
+async def import_notes_file(path: Path, format: ExportFormat) -> None:
+    def print_progress(report: NoteImportReport) -> None:
+        print(f"imported {report.imported} notes, {report.failed} failed rows")
+
+    report = await ImportNotes(AsyncSessionLocal).execute(
+        chunks=read_file_chunks(path), format=format, on_progress=print_progress
+    )
+    for error in report.errors:
+        print(f"row {error.row}: {error.message}")
+    if report.errors_truncated:
+        print("more rows failed, only the first errors are listed")
+
 
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        match sys.argv[1]:
-            case "api":
-                asyncio.run(ping_database())  # ping database before server start, exit when failed
+    match sys.argv[1:]:
+        case ["api"]:
+            # development server: single process, restarts on code changes
+            asyncio.run(ping_database())  # ping database before server start, exit when failed
+
+            uvicorn.run("main:app", host="0.0.0.0", port=settings.PORT, reload=True)
+
+        case ["serve", *workers]:
+            # production server, worker count from the argument or WEB_CONCURRENCY
+            workers = int(workers[0]) if workers else settings.WEB_CONCURRENCY
+            workers = workers or os.cpu_count() or 1
+            # the workers read the resolved count, e.g. to pick a shared cache
+            os.environ["WEB_CONCURRENCY"] = str(workers)
+            asyncio.run(ping_database())
+
+            # every worker is a spawned process importing main:app, so each one
+            # builds its own engine and pool; SIGTERM lets in-flight requests finish
+            uvicorn.run(
+                "main:app",
+                host="0.0.0.0",
+                port=settings.PORT,
+                workers=workers,
+                proxy_headers=True,
+                **server_implementations(),
+            )
+
+        case ["migrate"]:
+            migrate_database_tables()
 
-                uvicorn.run("main:app", host="0.0.0.0", port=settings.PORT, reload=True)
+        case ["reconcile-note-stats"]:
+            asyncio.run(run_note_stats_reconciliation())
 
-            case "migrate":
-                migrate_database_tables()
+        case ["import", path, *format]:
+            # format defaults to the file extension: .csv or .ndjson
+            path = Path(path)
+            format = format[0] if format else path.suffix.lstrip(".")
+            formats = [f.value for f in ExportFormat]
+            if format not in formats:
+                sys.exit(f"unsupported import format {format!r}, use one of: {formats}")
+            if not path.is_file():
+                sys.exit(f"no such file: {path}")
+            asyncio.run(import_notes_file(path, ExportFormat(format)))
@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
 from enum import Enum
 
@@ -6,9 +8,18 @@ from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from settings import settings
+from utils.cache import TTLCache
+from utils.metrics import register_metrics
 
 algorithm = "HS256"
 
+# user_id of already verified access tokens, keyed by sha256 of the token
+access_token_cache = TTLCache(
+    maxsize=settings.ACCESS_TOKEN_CACHE_SIZE,
+    ttl=settings.ACCESS_TOKEN_CACHE_TTL_SECONDS,
+)
+register_metrics("access_token_cache", access_token_cache.stats)
+
 
 class TokenType(Enum):
     ACCESS = "access"
@@ -65,6 +76,13 @@ async def get_user_id_from_access_token(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    cache_key = None
+    if access_token_cache.enabled:
+        cache_key = hashlib.sha256(token.credentials.encode()).digest()
+        user_id = access_token_cache.get(cache_key)
+        if user_id is not None:
+            return user_id
+
     try:
         payload = jwt.decode(
             token.credentials, settings.SECRET_KEY, algorithms=[algorithm]
@@ -89,6 +107,19 @@ async def get_user_id_from_access_token(
     if user_id is None:
         raise credentials_exception
 
+    if cache_key is not None and "exp" in payload:
+        # never serve a token from cache past its own expiry
+        access_token_cache.set(cache_key, user_id, ttl=payload["exp"] - time.time())
+
+    return user_id
+
+
+async def get_admin_user_id(
+    user_id: int = Depends(get_user_id_from_access_token),
+) -> int:
+    if user_id not in settings.ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="admin privilege required")
+
     return user_id
 
 
@@ -0,0 +1,44 @@
+import math
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from db import READ_PRIMARY_COOKIE, read_session_factory, request_writers
+from settings import settings
+
+
+class ReadYourWritesMiddleware:
+    """
+    Give a client that wrote a short-lived cookie holding the end of its
+    read-your-writes window. Its next requests keep reading from the primary,
+    whichever worker serves them.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not read_session_factory.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        # mutated by mark_user_write, the endpoint may run in a copied context
+        writers = set()
+        token = request_writers.set(writers)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and writers:
+                seconds = settings.DB_READ_YOUR_WRITES_SECONDS
+                until = math.ceil(time.time() + seconds)
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={until}; Max-Age={seconds}; Path=/;"
+                    " HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            request_writers.reset(token)
@@ -0,0 +1,77 @@
+"""add notes and users indexes
+
+Revision ID: 0023e0d27958
+Revises: 645f8aa86605
+Create Date: 2026-10-18 10:02:17.604418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0023e0d27958"
+down_revision = "645f8aa86605"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction,
+    # it keeps the tables writable while the indexes are built
+    with op.get_context().autocommit_block():
+        # GetAllNotes for the token user: filter on created_by, keyset order
+        op.create_index(
+            "ix_notes_created_by_created_at_active",
+            "notes",
+            ["created_by", sa.text("created_at DESC"), sa.text("note_id DESC")],
+            postgresql_where=sa.text("deleted_at IS NULL"),
+            postgresql_concurrently=True,
+        )
+        # same listing with include_deleted_note, also backs the created_by FK
+        op.create_index(
+            "ix_notes_created_by_created_at",
+            "notes",
+            ["created_by", sa.text("created_at DESC"), sa.text("note_id DESC")],
+            postgresql_concurrently=True,
+        )
+        # GetAllNotes across all users (filter_by_user_id=false)
+        op.create_index(
+            "ix_notes_created_at_active",
+            "notes",
+            [sa.text("created_at DESC"), sa.text("note_id DESC")],
+            postgresql_where=sa.text("deleted_at IS NULL"),
+            postgresql_concurrently=True,
+        )
+        # LoginUser looks up username OR email, Register/UpdateUser check both
+        op.create_index(
+            "ix_users_username",
+            "users",
+            ["username"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_users_email",
+            "users",
+            ["email"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_users_email", "users", postgresql_concurrently=True)
+        op.drop_index("ix_users_username", "users", postgresql_concurrently=True)
+        op.drop_index(
+            "ix_notes_created_at_active", "notes", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_notes_created_by_created_at", "notes", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_notes_created_by_created_at_active",
+            "notes",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,44 @@
+"""add notes changes index
+
+Revision ID: 5b7e9c1d2a40
+Revises: c2d4e81b7f3a
+Create Date: 2026-10-18 15:21:08.941637
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b7e9c1d2a40"
+down_revision = "c2d4e81b7f3a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # deletes now move updated_at as well, bring older tombstones (and rows that
+    # never got an updated_at) in line so delta sync sees them
+    op.execute(
+        """
+        UPDATE notes
+        SET updated_at = greatest(updated_at, created_at, deleted_at)
+        WHERE updated_at IS NULL OR deleted_at > updated_at
+        """
+    )
+
+    # GetNoteChanges: filter on created_by, keyset on (updated_at, note_id)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notes_created_by_updated_at",
+            "notes",
+            ["created_by", "updated_at", "note_id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_notes_created_by_updated_at", "notes", postgresql_concurrently=True
+        )
@@ -0,0 +1,45 @@
+"""add table user_note_stats
+
+Revision ID: 645f8aa86605
+Revises: 8319efa16ea0
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "645f8aa86605"
+down_revision = "8319efa16ea0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_note_stats",
+        sa.Column(
+            "user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True
+        ),
+        sa.Column("active_notes", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("deleted_notes", sa.Integer, nullable=False, server_default="0"),
+    )
+
+    # backfill counters for notes created before this revision
+    op.execute(
+        """
+        INSERT INTO user_note_stats (user_id, active_notes, deleted_notes)
+        SELECT
+            created_by,
+            count(*) FILTER (WHERE deleted_at IS NULL),
+            count(*) FILTER (WHERE deleted_at IS NOT NULL)
+        FROM notes
+        WHERE created_by IS NOT NULL
+        GROUP BY created_by
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_note_stats")
@@ -0,0 +1,42 @@
+"""add users trigram indexes
+
+Revision ID: a946a0c2870b
+Revises: f63928a0f0c1
+Create Date: 2026-10-18 12:04:51.730266
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a946a0c2870b"
+down_revision = "f63928a0f0c1"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("username", "email", "name")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # serve ILIKE '%term%' and the similarity operator of ReadAllUser search
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.create_index(
+                f"ix_users_{column}_trgm",
+                "users",
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.drop_index(
+                f"ix_users_{column}_trgm", "users", postgresql_concurrently=True
+            )
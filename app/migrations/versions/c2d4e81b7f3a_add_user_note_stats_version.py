@@ -0,0 +1,27 @@
+"""add user_note_stats version
+
+Revision ID: c2d4e81b7f3a
+Revises: a946a0c2870b
+Create Date: 2026-10-18 14:02:17.553910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c2d4e81b7f3a"
+down_revision = "a946a0c2870b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_note_stats",
+        sa.Column("version", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("user_note_stats", "version")
@@ -0,0 +1,52 @@
+"""add notes search vector
+
+Revision ID: f63928a0f0c1
+Revises: 0023e0d27958
+Create Date: 2026-10-18 11:20:05.118932
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "f63928a0f0c1"
+down_revision = "0023e0d27958"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # stored generated column: postgres keeps it in sync with title and content
+    op.add_column(
+        "notes",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR,
+            sa.Computed(
+                "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+                persisted=True,
+            ),
+        ),
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notes_search_vector_active",
+            "notes",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_where=sa.text("deleted_at IS NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_notes_search_vector_active", "notes", postgresql_concurrently=True
+        )
+
+    op.drop_column("notes", "search_vector")
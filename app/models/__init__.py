@@ -1,2 +1,4 @@
 from .base import Base
 from .user import User
+from .note import Note
+from .user_note_stats import UserNoteStats
@@ -3,11 +3,15 @@ from __future__ import annotations
 import datetime
 
 from pydantic import BaseModel
-from sqlalchemy import ForeignKey
+from sqlalchemy import Computed, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
 
+# text search configuration of notes.search_vector, queries must use the same one
+SEARCH_CONFIG = "simple"
+
 
 class Note(Base):
     __tablename__ = "notes"
@@ -48,6 +52,50 @@ class Note(Base):
         ForeignKey("users.user_id"),
         nullable=True,
     )
+    search_vector: Mapped[str] = mapped_column(
+        "search_vector",
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+        nullable=True,
+    )
+
+
+Index(
+    "ix_notes_created_by_created_at_active",
+    Note.created_by,
+    Note.created_at.desc(),
+    Note.note_id.desc(),
+    postgresql_where=Note.deleted_at.is_(None),
+)
+Index(
+    "ix_notes_created_by_created_at",
+    Note.created_by,
+    Note.created_at.desc(),
+    Note.note_id.desc(),
+)
+Index(
+    "ix_notes_search_vector_active",
+    Note.search_vector,
+    postgresql_using="gin",
+    postgresql_where=Note.deleted_at.is_(None),
+)
+Index(
+    "ix_notes_created_by_updated_at",
+    Note.created_by,
+    Note.updated_at,
+    Note.note_id,
+)
+Index(
+    "ix_notes_created_at_active",
+    Note.created_at.desc(),
+    Note.note_id.desc(),
+    postgresql_where=Note.deleted_at.is_(None),
+)
 
 
 class NoteSchema(BaseModel):
@@ -63,4 +111,8 @@ class NoteSchema(BaseModel):
 
     class Config:
         orm_mode = True
-        underscore_attrs_are_private = True
\ No newline at end of file
+        underscore_attrs_are_private = True
+
+
+# columns backing NoteSchema, for projected selects and RETURNING clauses
+NOTE_SCHEMA_COLUMNS = tuple(getattr(Note, name) for name in NoteSchema.__fields__)
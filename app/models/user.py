@@ -3,7 +3,7 @@ from __future__ import annotations
 import datetime
 
 from pydantic import BaseModel
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from models.base import Base
@@ -52,6 +52,10 @@ class User(Base):
     )
 
 
+Index("ix_users_username", User.username, unique=True)
+Index("ix_users_email", User.email, unique=True)
+
+
 class UserSchema(BaseModel):
     user_id: int
     name: str
@@ -68,3 +72,7 @@ class UserSchema(BaseModel):
     class Config:
         orm_mode = True
         underscore_attrs_are_private = True
+
+
+# columns backing UserSchema, for projected selects
+USER_SCHEMA_COLUMNS = tuple(getattr(User, name) for name in UserSchema.__fields__)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from sqlalchemy import BigInteger, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class UserNoteStats(Base):
+    __tablename__ = "user_note_stats"
+
+    user_id: Mapped[int] = mapped_column(
+        "user_id",
+        ForeignKey("users.user_id"),
+        primary_key=True,
+    )
+    active_notes: Mapped[int] = mapped_column(
+        "active_notes",
+        default=0,
+        nullable=False,
+    )
+    deleted_notes: Mapped[int] = mapped_column(
+        "deleted_notes",
+        default=0,
+        nullable=False,
+    )
+    # bumped by every note write of the user, versions the user's note listing
+    version: Mapped[int] = mapped_column(
+        "version",
+        BigInteger,
+        default=0,
+        server_default="0",
+        nullable=False,
+    )
@@ -18,6 +18,44 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
     DB_DSN: str = ""
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds a checkout waits before failing
+    DB_POOL_RECYCLE: int = -1  # seconds before a connection is replaced, -1 never
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection
+    # PgBouncer in transaction mode: no statement caches, uniquely named statements
+    DB_PGBOUNCER_MODE: bool = False
+    DB_REPLICA_DSNS: list[str] = []  # read replicas for read-only use cases
+    DB_REPLICA_EJECT_SECONDS: int = 30  # replica skipped after a connection error
+    DB_READ_YOUR_WRITES_SECONDS: int = 5  # a writer's reads stay on the primary
+    ACCESS_TOKEN_CACHE_SIZE: int = 4096  # 0 disables the verified token cache
+    ACCESS_TOKEN_CACHE_TTL_SECONDS: int = 300
+    NOTE_BATCH_MAX_OPERATIONS: int = 500
+    NOTE_IMPORT_CHUNK_SIZE: int = 5000
+    NOTE_IMPORT_MAX_ERRORS: int = 1000
+    ADMIN_USER_IDS: list[int] = []
+    # memory, redis or none; unset: memory with a single worker, none with several
+    # (the memory cache is per process and misses the other workers' updates)
+    NOTE_CACHE_BACKEND: str = ""
+    NOTE_CACHE_URL: str = "redis://localhost:6379/0"
+    NOTE_CACHE_SIZE: int = 10000
+    NOTE_CACHE_TTL_SECONDS: int = 60
+    # after a write, fills of the note are refused this long, longer than a read
+    NOTE_CACHE_TOMBSTONE_SECONDS: int = 5
+    USER_CACHE_SIZE: int = 10000  # 0 disables the user profile cache
+    USER_CACHE_TTL_SECONDS: int = 30
+    # after a profile change, fills of the user are refused this long
+    USER_CACHE_TOMBSTONE_SECONDS: int = 5
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+    NOTE_EVENTS_QUEUE_SIZE: int = 100
+    NOTE_EVENTS_HEARTBEAT_SECONDS: int = 15
+    # share note events between workers through postgres LISTEN/NOTIFY
+    NOTE_EVENTS_BRIDGE: bool = False
+    NOTE_EVENTS_CHANNEL: str = "note_events"
+    WEB_CONCURRENCY: int = 0  # serve worker processes, 0 means one per CPU
 
     @validator("DB_DSN", pre=True)
     def assemble_db_connection(cls, v: str, values: Dict[str, Any]) -> Any:
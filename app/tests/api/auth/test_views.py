@@ -1,10 +1,18 @@
+import time
+
 import bcrypt
+import jwt
 import pytest
+from fastapi.security import HTTPAuthorizationCredentials
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from middlewares import authentication
+from middlewares.authentication import TokenType, get_user_id_from_access_token
 from models import User
+from settings import settings
+from utils.cache import TTLCache
 
 PASSWORD="Test123!"
 pw_bytes = PASSWORD.encode()
@@ -87,4 +95,34 @@ async def test_auth_viewsr(ac: AsyncClient, session: AsyncSession) -> None:
     )
 
     assert 200 == response.status_code
-    
\ No newline at end of file
+    
+
+@pytest.mark.anyio
+async def test_access_token_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    token = jwt.encode(
+        payload={
+            "exp": int(time.time()) + 10,
+            "user_id": 1,
+            "token_type": TokenType.ACCESS.value,
+        },
+        key=settings.SECRET_KEY,
+        algorithm=authentication.algorithm,
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    """Cached until exp at the latest"""
+    cache = TTLCache(maxsize=10, ttl=300)
+    monkeypatch.setattr(authentication, "access_token_cache", cache)
+    assert await get_user_id_from_access_token(credentials) == 1
+    assert await get_user_id_from_access_token(credentials) == 1
+    assert cache.stats()["hits"] == 1
+    ((expires_at, _),) = cache._data.values()
+    assert expires_at - time.monotonic() <= 10
+
+    """Disabled with ACCESS_TOKEN_CACHE_SIZE=0"""
+    cache = TTLCache(maxsize=0, ttl=300)
+    monkeypatch.setattr(authentication, "access_token_cache", cache)
+    assert await get_user_id_from_access_token(credentials) == 1
+    assert await get_user_id_from_access_token(credentials) == 1
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 0
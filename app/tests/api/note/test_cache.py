@@ -0,0 +1,16 @@
+import pytest
+
+from api.note.cache import cache_note, get_cached_note, invalidate_notes
+from models.note import NoteSchema
+
+
+@pytest.mark.anyio
+async def test_note_cache_refuses_stale_fill() -> None:
+    note = NoteSchema(note_id=-1, title="old", content="c", created_by=1)
+    await cache_note(note)
+    assert await get_cached_note(-1) == note
+
+    # a read that loaded the note before the update fills after its invalidation
+    await invalidate_notes(-1)
+    await cache_note(note)
+    assert await get_cached_note(-1) is None
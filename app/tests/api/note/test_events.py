@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api.note import events
+from api.note.events import (
+    NoteEvent,
+    NoteEventBroker,
+    NoteEventListener,
+    NoteEventType,
+    note_event_stream,
+    note_events,
+    publish_note_events,
+)
+from middlewares.authentication import generate_access_token
+from models import User
+from models.note import NoteSchema
+from settings import settings
+
+
+@pytest.mark.anyio
+async def test_note_events(ac: AsyncClient, session: AsyncSession) -> None:
+    # setup
+    user = User(
+        name="Events User",
+        email="eventsuser@email.com",
+        username="eventsuser",
+        password="not-used",
+    )
+    session.add(user)
+    await session.flush()
+    user_id = user.user_id
+    await session.commit()
+    headers = {"Authorization": "Bearer " + generate_access_token(user_id)}
+
+    stream = note_event_stream(user_id)
+    assert await anext(stream) == ": connected\n\n"
+    received = asyncio.ensure_future(anext(stream))
+
+    response = await ac.post(
+        "/api/v1/notes", headers=headers, json={"title": "pushed", "content": "c"}
+    )
+    note_id = response.json()["data"]["note_id"]
+
+    message = await asyncio.wait_for(received, timeout=1)
+    assert message.startswith("event: created\nid: ")
+    assert f'"note_id": {note_id}' in message
+
+    await ac.delete(f"/api/v1/notes/{note_id}", headers=headers)
+    assert (await anext(stream)).startswith("event: deleted\n")
+
+    await stream.aclose()
+    assert user_id not in note_events.subscribers
+
+
+@pytest.mark.anyio
+async def test_note_event_broker_overflow() -> None:
+    broker = NoteEventBroker(queue_size=2)
+    note = NoteSchema(note_id=1, title="t", content="c", created_by=1)
+    with broker.subscribe(1) as queue:
+        for _ in range(4):
+            broker.dispatch(NoteEvent(type=NoteEventType.UPDATED, note=note))
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert len(items) == 3 and items[-1] is None
+    assert broker.overflowed == 1
+    assert broker.subscribers == {}
+
+
+@pytest.mark.anyio
+async def test_note_event_bridge_failures(monkeypatch: pytest.MonkeyPatch) -> None:
+    note = NoteSchema(note_id=1, title="t", content="c", created_by=1)
+
+    """Publish: a failed NOTIFY does not fail the committed write"""
+    engine = create_async_engine(settings.DB_DSN.replace(settings.DB_PORT, "1", 1))
+    monkeypatch.setattr(events, "async_engine", engine)
+    monkeypatch.setattr("settings.settings.NOTE_EVENTS_BRIDGE", True)
+    with note_events.subscribe(1) as queue:
+        await publish_note_events(NoteEvent(type=NoteEventType.CREATED, note=note))
+        # the local streams of the owner resync
+        assert queue.get_nowait() is None
+    await engine.dispose()
+
+    """Listen: any error reconnects and resyncs the subscribers"""
+    attempts = 0
+    reconnected = asyncio.Event()
+
+    class FailingConnection:
+        def add_termination_listener(self, callback) -> None:
+            pass
+
+        async def add_listener(self, channel: str, callback) -> None:
+            raise RuntimeError("listen failed")
+
+        def is_closed(self) -> bool:
+            return False
+
+        async def close(self) -> None:
+            pass
+
+    async def connect(dsn: str) -> FailingConnection:
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            reconnected.set()
+        return FailingConnection()
+
+    monkeypatch.setattr(events.asyncpg, "connect", connect)
+    monkeypatch.setattr(events, "LISTENER_RETRY_SECONDS", 0)
+    broker = NoteEventBroker(queue_size=2)
+    listener = NoteEventListener(broker, dsn="unused", channel="note_events")
+    with broker.subscribe(1) as queue:
+        listener.start()
+        await asyncio.wait_for(reconnected.wait(), timeout=1)
+        await listener.stop()
+        assert queue.get_nowait() is None
+
+
+@pytest.mark.anyio
+async def test_note_event_bridge_payloads(monkeypatch: pytest.MonkeyPatch) -> None:
+    engine = create_async_engine(settings.DB_DSN)
+    monkeypatch.setattr(events, "async_engine", engine)
+    monkeypatch.setattr("settings.settings.NOTE_EVENTS_BRIDGE", True)
+    broker = NoteEventBroker(queue_size=10)
+    listener = NoteEventListener(
+        broker,
+        dsn=settings.DB_DSN.replace("+asyncpg", ""),
+        channel=settings.NOTE_EVENTS_CHANNEL,
+    )
+    # longest title and content the API accepts, emoji need 4 bytes each
+    emoji = NoteSchema(
+        note_id=1, title="\U0001f600" * 255, content="\U0001f600" * 500, created_by=1
+    )
+    oversized = NoteSchema(note_id=2, title="t", content="x" * 9000, created_by=1)
+
+    with broker.subscribe(1) as queue:
+        listener.start()
+        await asyncio.sleep(0.5)
+        # one batch: the oversized event must not take the other one down with it
+        await publish_note_events(
+            NoteEvent(type=NoteEventType.UPDATED, note=emoji),
+            NoteEvent(type=NoteEventType.UPDATED, note=oversized),
+        )
+        first = await asyncio.wait_for(queue.get(), timeout=1)
+        second = await asyncio.wait_for(queue.get(), timeout=1)
+        await listener.stop()
+
+    assert first.note == emoji
+    assert second is None
+    await engine.dispose()
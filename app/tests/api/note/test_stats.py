@@ -0,0 +1,136 @@
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api.note.stats import (
+    get_note_stats,
+    lock_note_stats,
+    reconcile_note_stats,
+    settle_note_changes,
+    update_note_stats,
+)
+from models import User
+from models.note import Note
+from models.user_note_stats import UserNoteStats
+from settings import settings
+
+
+@pytest.mark.anyio
+async def test_reconcile_note_stats(session: AsyncSession) -> None:
+    # setup
+    users = [
+        User(
+            name=f"Stats User {i}",
+            email=f"statsuser{i}@email.com",
+            username=f"statsuser{i}",
+            password="not-used",
+        )
+        for i in range(2)
+    ]
+    session.add_all(users)
+    await session.flush()
+    user_id, stale_user_id = (u.user_id for u in users)
+    now = datetime.datetime.utcnow()
+    session.add_all(
+        Note(
+            title=f"n{i}",
+            content="c",
+            created_by=user_id,
+            created_at=now,
+            updated_at=now,
+            deleted_at=now if i == 0 else None,
+        )
+        for i in range(3)
+    )
+    # drifted counters, and a counter for a user without any note
+    await update_note_stats(session, user_id, active_delta=10, deleted_delta=-4)
+    await update_note_stats(session, stale_user_id, active_delta=5)
+    await session.commit()
+    version = (await get_note_stats(session, user_id)).version
+
+    """Reconcile"""
+    await reconcile_note_stats(session)
+    await session.commit()
+    session.expire_all()
+
+    stats = await get_note_stats(session, user_id)
+    assert (stats.active_notes, stats.deleted_notes) == (2, 1)
+    # the listing version moves, so cached listing ETags stop matching
+    assert stats.version > version
+
+    stats = await get_note_stats(session, stale_user_id)
+    assert (stats.active_notes, stats.deleted_notes) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_settle_note_changes() -> None:
+    # committed data and two connections, the fixture session is one open transaction
+    engine = create_async_engine(settings.DB_DSN)
+    async with engine.begin() as conn:
+        user_id = await conn.scalar(
+            insert(User)
+            .values(
+                name="Settle User",
+                email="settleuser@email.com",
+                username="settleuser",
+                password="not-used",
+            )
+            .returning(User.user_id)
+        )
+
+    async def read_changes() -> list[str]:
+        async with AsyncSession(engine) as reader:
+            await settle_note_changes(reader, user_id)
+            titles = await reader.scalars(
+                select(Note.title).where(Note.created_by == user_id)
+            )
+            return titles.all()
+
+    try:
+        """A read waits for the open write of the user, however long it runs"""
+        async with AsyncSession(engine) as writer, writer.begin():
+            now = await lock_note_stats(writer, user_id)
+            writer.add(
+                Note(
+                    title="slow",
+                    content="c",
+                    created_by=user_id,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            await writer.flush()
+
+            changes = asyncio.ensure_future(read_changes())
+            await asyncio.sleep(0.2)
+            assert not changes.done()
+
+        assert await changes == ["slow"]
+
+        """A write waits for the read, and is stamped after it"""
+        async with AsyncSession(engine) as reader:
+            await settle_note_changes(reader, user_id)
+            read_at = await reader.scalar(
+                select(func.timezone("utc", func.statement_timestamp()))
+            )
+
+            async def write() -> datetime.datetime:
+                async with AsyncSession(engine) as writer, writer.begin():
+                    return await lock_note_stats(writer, user_id)
+
+            stamp = asyncio.ensure_future(write())
+            await asyncio.sleep(0.2)
+            assert not stamp.done()
+
+        assert await stamp > read_at
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(Note).where(Note.created_by == user_id))
+            await conn.execute(
+                delete(UserNoteStats).where(UserNoteStats.user_id == user_id)
+            )
+            await conn.execute(delete(User).where(User.user_id == user_id))
+        await engine.dispose()
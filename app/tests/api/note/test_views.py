@@ -0,0 +1,432 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from middlewares.authentication import generate_access_token
+from models import User
+
+USER = User(
+    name="Test Note User",
+    email="testnoteuser@email.com",
+    username="testnoteuser",
+    password="not-used",
+)
+OTHER_USER = User(
+    name="Other Note User",
+    email="othernoteuser@email.com",
+    username="othernoteuser",
+    password="not-used",
+)
+
+
+async def setup_data(session: AsyncSession) -> tuple[dict, dict]:
+    session.add_all([USER, OTHER_USER])
+    await session.flush()
+    user_id, other_user_id = USER.user_id, OTHER_USER.user_id
+
+    await session.commit()
+
+    return (
+        {"Authorization": "Bearer " + generate_access_token(user_id)},
+        {"Authorization": "Bearer " + generate_access_token(other_user_id)},
+    )
+
+
+@pytest.mark.anyio
+async def test_note_views(ac: AsyncClient, session: AsyncSession) -> None:
+    # setup
+    headers, other_headers = await setup_data(session)
+
+    """Add Note"""
+    for i in range(5):
+        response = await ac.post(
+            "/api/v1/notes",
+            headers=headers,
+            json={"title": f"note {i}", "content": f"content {i}"},
+        )
+        assert 200 == response.status_code
+
+    """Get All Notes (offset)"""
+    response = await ac.get(
+        "/api/v1/notes", headers=headers, params={"item_per_page": 2, "page": 2}
+    )
+    assert 200 == response.status_code
+    assert len(response.json()["data"]["records"]) == 2
+    assert response.json()["data"]["meta"]["total_item"] == 5
+    assert response.json()["data"]["meta"]["has_next"] is True
+
+    """Get All Notes (count modes)"""
+    response = await ac.get(
+        "/api/v1/notes",
+        headers=headers,
+        params={"item_per_page": 2, "page": 3, "count": "none"},
+    )
+    assert 200 == response.status_code
+    assert len(response.json()["data"]["records"]) == 1
+    assert response.json()["data"]["meta"]["total_item"] is None
+    assert response.json()["data"]["meta"]["has_next"] is False
+
+    response = await ac.get(
+        "/api/v1/notes", headers=headers, params={"count": "estimate"}
+    )
+    assert 200 == response.status_code
+    assert response.json()["data"]["meta"]["total_item"] >= 0
+
+    """Get All Notes (cursor)"""
+    seen = []
+    params = {"item_per_page": 2, "cursor": True}
+    while True:
+        response = await ac.get("/api/v1/notes", headers=headers, params=params)
+        assert 200 == response.status_code
+        data = response.json()["data"]
+        seen.extend(r["note_id"] for r in data["records"])
+        if data["meta"]["next_cursor"] is None:
+            break
+        params = {"item_per_page": 2, "after": data["meta"]["next_cursor"]}
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+    response = await ac.get(
+        "/api/v1/notes", headers=headers, params={"after": "not-a-cursor"}
+    )
+    assert 400 == response.status_code
+
+    """Access Token Cache"""
+    # every request above after the first reused the verified token
+    response = await ac.get("/api/v1/health/metrics")
+    assert response.json()["data"]["access_token_cache"]["hits"] > 0
+
+    """Get All Notes (sparse fieldset)"""
+    response = await ac.get(
+        "/api/v1/notes",
+        headers=headers,
+        params={"fields": "title,note_id", "cursor": True, "item_per_page": 2},
+    )
+    assert 200 == response.status_code
+    data = response.json()["data"]
+    assert [list(r) for r in data["records"]] == [["note_id", "title"]] * 2
+    assert [r["note_id"] for r in data["records"]] == seen[:2]
+    assert data["meta"]["next_cursor"] is not None
+
+    response = await ac.get(
+        "/api/v1/notes", headers=headers, params={"fields": "title,password"}
+    )
+    assert 400 == response.status_code
+
+    """Get / Update Note"""
+    response = await ac.get(f"/api/v1/notes/{seen[0]}", headers=headers)
+    assert 200 == response.status_code
+    assert response.json()["data"]["note_id"] == seen[0]
+    note_etag = response.headers["ETag"]
+
+    response = await ac.get(
+        f"/api/v1/notes/{seen[0]}", headers={**headers, "If-None-Match": note_etag}
+    )
+    assert 304 == response.status_code
+    assert response.headers["ETag"] == note_etag
+
+    response = await ac.get(
+        f"/api/v1/notes/{seen[0]}",
+        headers={**other_headers, "If-None-Match": note_etag},
+    )
+    assert 401 == response.status_code
+
+    response = await ac.get("/api/v1/notes", headers=headers)
+    list_etag = response.headers["ETag"]
+    response = await ac.get(
+        "/api/v1/notes", headers={**headers, "If-None-Match": list_etag}
+    )
+    assert 304 == response.status_code
+
+    response = await ac.put(
+        f"/api/v1/notes/{seen[0]}",
+        headers=headers,
+        json={"title": "updated", "content": "updated content"},
+    )
+    assert 200 == response.status_code
+    assert response.json()["data"]["title"] == "updated"
+
+    response = await ac.get(
+        f"/api/v1/notes/{seen[0]}", headers={**headers, "If-None-Match": note_etag}
+    )
+    assert 200 == response.status_code
+    assert response.json()["data"]["title"] == "updated"
+    assert response.headers["ETag"] != note_etag
+
+    response = await ac.get(
+        "/api/v1/notes", headers={**headers, "If-None-Match": list_etag}
+    )
+    assert 200 == response.status_code
+    assert response.headers["ETag"] != list_etag
+
+    response = await ac.put(
+        f"/api/v1/notes/{seen[0]}",
+        headers=other_headers,
+        json={"title": "stolen", "content": "stolen content"},
+    )
+    assert 401 == response.status_code
+
+    response = await ac.delete(f"/api/v1/notes/{seen[0]}", headers=other_headers)
+    assert 401 == response.status_code
+
+    """Batch"""
+    response = await ac.post(
+        "/api/v1/notes:batch",
+        headers=headers,
+        json={
+            "create": [
+                {"title": "batch a", "content": "a"},
+                {"title": "batch b", "content": "b"},
+            ],
+            "update": [{"note_id": seen[1], "title": "batch u", "content": "u"}],
+            "delete": [seen[2], 987654321],
+        },
+    )
+    assert 200 == response.status_code
+    result = response.json()["data"]
+    assert [r["data"]["title"] for r in result["create"]] == ["batch a", "batch b"]
+    assert result["update"][0]["data"]["title"] == "batch u"
+    assert result["delete"][0]["status"] == "success"
+    assert result["delete"][1]["message"] == "note not found"
+
+    response = await ac.post(
+        "/api/v1/notes:batch",
+        headers=other_headers,
+        json={"delete": [seen[1]]},
+    )
+    result = response.json()["data"]
+    assert result["delete"][0]["message"] == "not valid credentials"
+
+    response = await ac.get("/api/v1/notes", headers=headers)
+    assert response.json()["data"]["meta"]["total_item"] == 6
+
+    """Export"""
+    response = await ac.get("/api/v1/notes/export", headers=headers)
+    assert 200 == response.status_code
+    assert len(response.text.splitlines()) == 6
+
+    response = await ac.get(
+        "/api/v1/notes/export", headers=headers, params={"format": "csv"}
+    )
+    assert 200 == response.status_code
+    assert response.text.splitlines()[0].startswith("note_id,title,content")
+    assert len(response.text.splitlines()) == 7
+
+    """Delete Note"""
+    response = await ac.delete(f"/api/v1/notes/{seen[0]}", headers=headers)
+    assert 200 == response.status_code
+
+    response = await ac.get("/api/v1/notes", headers=headers)
+    assert response.json()["data"]["meta"]["total_item"] == 5
+
+    response = await ac.get(f"/api/v1/notes/{seen[0]}", headers=headers)
+    assert 404 == response.status_code
+
+    response = await ac.delete(f"/api/v1/notes/{seen[0]}", headers=headers)
+    assert 404 == response.status_code
+
+    response = await ac.get(
+        "/api/v1/notes", headers=headers, params={"include_deleted_note": True}
+    )
+    assert response.json()["data"]["meta"]["total_item"] == 7
+
+
+@pytest.mark.anyio
+async def test_note_import(
+    ac: AsyncClient, session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # setup
+    admin = User(
+        name="Import Admin",
+        email="importadmin@email.com",
+        username="importadmin",
+        password="not-used",
+    )
+    session.add(admin)
+    await session.flush()
+    admin_id = admin.user_id
+    await session.commit()
+    headers = {"Authorization": "Bearer " + generate_access_token(admin_id)}
+
+    body = "title,content,created_by\n" f"a,b,{admin_id}\n" "c,,1\n" f"e,f,{admin_id}\n"
+
+    response = await ac.post(
+        "/api/v1/notes/import", headers=headers, params={"format": "csv"}, content=body
+    )
+    assert 403 == response.status_code
+
+    monkeypatch.setattr("settings.settings.ADMIN_USER_IDS", [admin_id])
+    response = await ac.post(
+        "/api/v1/notes/import", headers=headers, params={"format": "csv"}, content=body
+    )
+    assert 200 == response.status_code
+    assert response.json()["data"]["imported"] == 2
+    assert response.json()["data"]["errors"][0]["row"] == 2
+
+    response = await ac.get("/api/v1/notes", headers=headers)
+    assert response.json()["data"]["meta"]["total_item"] == 2
+
+    """Import behind a held watermark"""
+    response = await ac.get("/api/v1/notes/changes", headers=headers)
+    watermark = response.json()["data"]["watermark"]
+
+    body = (
+        "title,content,created_by,created_at\n"
+        f"old,g,{admin_id},2001-01-01T00:00:00\n"
+    )
+    response = await ac.post(
+        "/api/v1/notes/import", headers=headers, params={"format": "csv"}, content=body
+    )
+    assert response.json()["data"]["imported"] == 1
+
+    # a past created_at still syncs, updated_at is the import time
+    response = await ac.get(
+        "/api/v1/notes/changes", headers=headers, params={"since": watermark}
+    )
+    assert [n["title"] for n in response.json()["data"]["changes"]] == ["old"]
+
+    """Aware timestamps and a row COPY would reject"""
+    body = (
+        f'{{"title": "utc", "content": "c", "created_by": {admin_id},'
+        ' "created_at": "2024-01-01T00:00:00Z"}\n'
+        f'{{"title": "offset", "content": "c", "created_by": {admin_id},'
+        ' "created_at": "2024-01-01T07:00:00+07:00"}\n'
+        f'{{"title": "nul \\u0000", "content": "c", "created_by": {admin_id}}}\n'
+    )
+    response = await ac.post(
+        "/api/v1/notes/import",
+        headers=headers,
+        params={"format": "ndjson"},
+        content=body,
+    )
+    data = response.json()["data"]
+    assert data["imported"] == 2
+    assert [e["row"] for e in data["errors"]] == [3]
+
+    response = await ac.get("/api/v1/notes/changes", headers=headers)
+    created_at = {
+        n["title"]: n["created_at"] for n in response.json()["data"]["changes"]
+    }
+    assert created_at["utc"] == created_at["offset"] == "2024-01-01T00:00:00"
+
+
+@pytest.mark.anyio
+async def test_note_search(ac: AsyncClient, session: AsyncSession) -> None:
+    # setup
+    user = User(
+        name="Search User",
+        email="searchuser@email.com",
+        username="searchuser",
+        password="not-used",
+    )
+    session.add(user)
+    await session.flush()
+    user_id = user.user_id
+    await session.commit()
+    headers = {"Authorization": "Bearer " + generate_access_token(user_id)}
+
+    notes = [
+        {"title": "grocery list", "content": "milk, eggs and bread"},
+        {"title": "bread recipe", "content": "flour, water, salt and yeast"},
+        {"title": "meeting", "content": "discuss the bread order"},
+        {"title": "weekend", "content": "hiking trip"},
+    ]
+    response = await ac.post(
+        "/api/v1/notes:batch", headers=headers, json={"create": notes}
+    )
+    assert 200 == response.status_code
+
+    seen = []
+    params = {"q": "bread", "item_per_page": 2}
+    while True:
+        response = await ac.get("/api/v1/notes/search", headers=headers, params=params)
+        assert 200 == response.status_code
+        data = response.json()["data"]
+        seen.extend(r["title"] for r in data["records"])
+        if data["meta"]["next_cursor"] is None:
+            break
+        params["after"] = data["meta"]["next_cursor"]
+
+    # a title match ranks first
+    assert seen[0] == "bread recipe"
+    assert sorted(seen) == ["bread recipe", "grocery list", "meeting"]
+
+
+@pytest.mark.anyio
+async def test_note_changes(ac: AsyncClient, session: AsyncSession) -> None:
+    # setup
+    users = [
+        User(
+            name=f"Sync User {i}",
+            email=f"syncuser{i}@email.com",
+            username=f"syncuser{i}",
+            password="not-used",
+        )
+        for i in range(2)
+    ]
+    session.add_all(users)
+    await session.flush()
+    headers, other_headers = (
+        {"Authorization": "Bearer " + generate_access_token(u.user_id)} for u in users
+    )
+    await session.commit()
+
+    note_ids = []
+    for i in range(3):
+        response = await ac.post(
+            "/api/v1/notes",
+            headers=headers,
+            json={"title": f"sync {i}", "content": f"sync content {i}"},
+        )
+        note_ids.append(response.json()["data"]["note_id"])
+    await ac.post(
+        "/api/v1/notes", headers=other_headers, json={"title": "x", "content": "x"}
+    )
+
+    """Initial sync, two pages"""
+    response = await ac.get(
+        "/api/v1/notes/changes", headers=headers, params={"item_per_page": 2}
+    )
+    assert 200 == response.status_code
+    data = response.json()["data"]
+    assert [n["note_id"] for n in data["changes"]] == note_ids[:2]
+    assert data["has_more"] is True
+
+    response = await ac.get(
+        "/api/v1/notes/changes",
+        headers=headers,
+        params={"item_per_page": 2, "since": data["watermark"]},
+    )
+    data = response.json()["data"]
+    assert [n["note_id"] for n in data["changes"]] == note_ids[2:]
+    assert data["has_more"] is False
+    watermark = data["watermark"]
+
+    """Nothing changed"""
+    response = await ac.get(
+        "/api/v1/notes/changes", headers=headers, params={"since": watermark}
+    )
+    data = response.json()["data"]
+    assert data["changes"] == [] and data["deleted"] == []
+    assert data["watermark"] == watermark
+
+    """Update and delete"""
+    await ac.put(
+        f"/api/v1/notes/{note_ids[0]}",
+        headers=headers,
+        json={"title": "synced", "content": "synced content"},
+    )
+    await ac.delete(f"/api/v1/notes/{note_ids[1]}", headers=headers)
+
+    response = await ac.get(
+        "/api/v1/notes/changes", headers=headers, params={"since": watermark}
+    )
+    data = response.json()["data"]
+    assert [n["title"] for n in data["changes"]] == ["synced"]
+    assert [n["note_id"] for n in data["deleted"]] == [note_ids[1]]
+
+    response = await ac.get(
+        "/api/v1/notes/changes", headers=headers, params={"since": "bad"}
+    )
+    assert 400 == response.status_code
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from api.user.cache import cache_user, get_cached_user, invalidate_users, user_fetches
+from models.user import UserSchema
+
+
+@pytest.mark.anyio
+async def test_user_cache_refuses_stale_fill() -> None:
+    old = UserSchema(user_id=-1, name="old", email="old@email.com", username="old")
+    new = UserSchema(user_id=-1, name="new", email="new@email.com", username="old")
+    cache_user(old)
+    assert get_cached_user(-1) == old
+
+    # a read that loaded the profile before the update fills after its invalidation
+    invalidate_users(-1)
+    cache_user(old)
+    assert get_cached_user(-1) is None
+
+    """A miss after the update does not join a fetch started before it"""
+    loaded = asyncio.Event()
+
+    async def fetch_old() -> UserSchema:
+        await loaded.wait()
+        cache_user(old)
+        return old
+
+    async def fetch_new() -> UserSchema:
+        cache_user(new)
+        return new
+
+    old, new = old.copy(update={"user_id": -2}), new.copy(update={"user_id": -2})
+    stale = asyncio.ensure_future(user_fetches.do(-2, fetch_old))
+    await asyncio.sleep(0)
+    invalidate_users(-2)
+    fresh = asyncio.ensure_future(user_fetches.do(-2, fetch_new))
+    loaded.set()
+
+    assert await stale == old
+    assert await fresh == new
+    assert get_cached_user(-2) is None
@@ -0,0 +1,174 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from middlewares.authentication import generate_access_token
+from models import User
+
+USER = User(
+    name="Test Profile User",
+    email="testprofileuser@email.com",
+    username="testprofileuser",
+    password="not-used",
+)
+
+
+async def setup_data(session: AsyncSession) -> tuple[int, dict]:
+    session.add_all([USER])
+    await session.flush()
+    user_id = USER.user_id
+
+    await session.commit()
+
+    return user_id, {"Authorization": "Bearer " + generate_access_token(user_id)}
+
+
+@pytest.mark.anyio
+async def test_user_views(ac: AsyncClient, session: AsyncSession) -> None:
+    # setup
+    user_id, headers = await setup_data(session)
+
+    """Read User"""
+    response = await ac.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert 200 == response.status_code
+    assert response.json()["data"]["name"] == "Test Profile User"
+
+    """Update User"""
+    response = await ac.put(
+        "/api/v1/users",
+        headers=headers,
+        json={
+            "name": "Renamed Profile User",
+            "username": "testprofileuser",
+            "email": "testprofileuser@email.com",
+        },
+    )
+    assert 200 == response.status_code
+
+    # served from the cache, which the update invalidated
+    response = await ac.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert response.json()["data"]["name"] == "Renamed Profile User"
+
+    """Deactivate User"""
+    response = await ac.put("/api/v1/users/deactivate", headers=headers)
+    assert 200 == response.status_code
+
+    response = await ac.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert 404 == response.status_code
+
+
+@pytest.mark.anyio
+async def test_read_users_by_ids(ac: AsyncClient, session: AsyncSession) -> None:
+    users = [
+        User(
+            name=f"Batch User {i}",
+            email=f"batchuser{i}@email.com",
+            username=f"batchuser{i}",
+            password="not-used",
+        )
+        for i in range(3)
+    ]
+    session.add_all(users)
+    await session.flush()
+    user_ids = [u.user_id for u in users]
+    await session.commit()
+    headers = {"Authorization": "Bearer " + generate_access_token(user_ids[0])}
+
+    # warm the cache for one of them, the rest comes from a single query
+    response = await ac.get(f"/api/v1/users/{user_ids[1]}", headers=headers)
+    assert 200 == response.status_code
+
+    ids = [user_ids[2], user_ids[0], 999999, user_ids[1], user_ids[2]]
+    response = await ac.get(
+        "/api/v1/users",
+        headers=headers,
+        params={"ids": ",".join(map(str, ids))},
+    )
+    assert 200 == response.status_code
+    data = response.json()["data"]
+    assert [u["user_id"] for u in data["records"]] == [
+        user_ids[2],
+        user_ids[0],
+        user_ids[1],
+    ]
+    assert data["meta"]["total_item"] == 3
+    assert data["meta"]["has_next"] is False
+
+    response = await ac.get(
+        "/api/v1/users",
+        headers=headers,
+        params={"ids": ",".join(map(str, user_ids)), "fields": "username,user_id"},
+    )
+    assert 200 == response.status_code
+    assert response.json()["data"]["records"][0] == {
+        "user_id": user_ids[0],
+        "username": "batchuser0",
+    }
+
+    response = await ac.get(
+        "/api/v1/users", headers=headers, params={"fields": "name", "item_per_page": 1}
+    )
+    assert 200 == response.status_code
+    assert list(response.json()["data"]["records"][0]) == ["name"]
+
+    response = await ac.get(
+        "/api/v1/users", headers=headers, params={"fields": "_password"}
+    )
+    assert 400 == response.status_code
+
+    response = await ac.get("/api/v1/users", headers=headers, params={"ids": "1,a"})
+    assert 422 == response.status_code
+
+    response = await ac.get(
+        "/api/v1/users",
+        headers=headers,
+        params={"ids": ",".join(str(i) for i in range(1, 102))},
+    )
+    assert 400 == response.status_code
+
+
+@pytest.mark.anyio
+async def test_user_search(ac: AsyncClient, session: AsyncSession) -> None:
+    available = await session.execute(
+        text("select 1 from pg_available_extensions where name = 'pg_trgm'")
+    )
+    if available.first() is None:
+        pytest.skip("pg_trgm is not available")
+
+    # setup
+    await session.execute(text("create extension if not exists pg_trgm"))
+    users = [
+        User(
+            name=f"Search {name}",
+            email=f"search{name}@email.com",
+            username=f"search_{name}",
+            password="not-used",
+        )
+        for name in ("alpha", "beta")
+    ]
+    session.add_all(users)
+    await session.flush()
+    headers = {"Authorization": "Bearer " + generate_access_token(users[0].user_id)}
+    await session.commit()
+
+    """Search"""
+    for count in ("exact", "estimate"):
+        response = await ac.get(
+            "/api/v1/users",
+            headers=headers,
+            params={"search": "alpha", "count": count},
+        )
+        assert 200 == response.status_code
+        records = response.json()["data"]["records"]
+        assert records[0]["username"] == "search_alpha"
+        assert "search_beta" not in [r["username"] for r in records]
+
+    # LIKE wildcards and bind parameter syntax are matched literally
+    response = await ac.get(
+        "/api/v1/users",
+        headers=headers,
+        params={"search": "h_a :word %", "count": "estimate"},
+    )
+    assert 200 == response.status_code
+    assert response.json()["data"]["records"] == []
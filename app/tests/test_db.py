@@ -0,0 +1,199 @@
+import re
+
+import pytest
+from fastapi import HTTPException, Request
+from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError, TimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.note.events import NoteEventType, note_events
+from api.note.schemas import AddNoteRequest, UpdateNoteRequest
+from api.note.use_cases import AddNewNote, DeleteNote, UpdateNote
+import db
+from db import (
+    READ_PRIMARY_COOKIE,
+    AsyncSessionLocal,
+    MeteredAsyncQueuePool,
+    Replica,
+    RequestSession,
+    RoutingSessionFactory,
+    UnitOfWork,
+    create_engine,
+    get_session,
+    read_session_factory,
+    reads_primary,
+)
+from main import app
+from middlewares.authentication import generate_access_token
+from models import User
+from models.note import Note
+from settings import settings
+from utils.cache import TTLCache
+
+
+@pytest.mark.anyio
+async def test_routing_session_factory() -> None:
+    good = Replica(create_engine(settings.DB_DSN))
+    bad = Replica(create_engine(settings.DB_DSN.replace(settings.DB_PORT, "1", 1)))
+    factory = RoutingSessionFactory(AsyncSessionLocal, [bad, good])
+
+    # the unreachable replica fails once and is then skipped
+    with pytest.raises((DBAPIError, OSError)):
+        async with factory() as session:
+            await session.execute(text("select 1"))
+    assert not bad.healthy and bad.ejections == 1
+
+    for _ in range(3):
+        session = factory()
+        assert session.bind is good.engine
+        await session.close()
+
+    # writes never go to a replica
+    async with factory.begin() as session:
+        assert session.bind is AsyncSessionLocal.kw["bind"]
+
+    # a request's reads stay on the replica picked for it
+    pinned = factory.pin()
+    assert {pinned().bind for _ in range(3)} == {good.engine}
+
+    good.ejected_until = bad.ejected_until
+    assert factory().bind is AsyncSessionLocal.kw["bind"]
+    assert factory.pin()().bind is AsyncSessionLocal.kw["bind"]
+
+    for replica in (good, bad):
+        await replica.engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_engine_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("settings.settings.DB_POOL_SIZE", 1)
+    monkeypatch.setattr("settings.settings.DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr("settings.settings.DB_POOL_TIMEOUT", 0.1)
+    monkeypatch.setattr("settings.settings.DB_POOL_RECYCLE", 60)
+    engine = create_engine(settings.DB_DSN)
+    pool = engine.pool
+    assert isinstance(pool, MeteredAsyncQueuePool)
+    assert (pool.size(), pool._max_overflow, pool._timeout, pool._recycle) == (
+        1,
+        0,
+        0.1,
+        60,
+    )
+
+    # the second checkout waits for the only connection and times out
+    async with engine.connect():
+        with pytest.raises(TimeoutError):
+            async with engine.connect():
+                pass
+    stats = pool.stats()
+    assert (stats["checkouts"], stats["timeouts"]) == (2, 1)
+    assert stats["wait_ms_max"] >= 100
+    await engine.dispose()
+
+    """PgBouncer mode: nothing cached, statements prepared under unique names"""
+    monkeypatch.setattr("settings.settings.DB_PGBOUNCER_MODE", True)
+    engine = create_engine(settings.DB_DSN)
+    async with engine.connect() as conn:
+        for _ in range(2):
+            await conn.execute(text("select 1"))
+        # what is left on the server connection is named per statement, not per
+        # client connection, and cannot clash with another client's statement
+        names = await conn.scalars(text("select name from pg_prepared_statements"))
+        names = names.all()
+        assert names
+        assert all(re.fullmatch(r"__asyncpg_[0-9a-f-]{36}__", n) for n in names)
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_replica_ejected_on_disconnect() -> None:
+    replica = Replica(create_engine(settings.DB_DSN))
+    async with replica.sessionmaker() as session:
+        pid = await session.scalar(text("select pg_backend_pid()"))
+        async with replica.engine.connect() as other:
+            await other.execute(text("select pg_terminate_backend(:pid)"), {"pid": pid})
+
+        with pytest.raises(DBAPIError):
+            await session.execute(text("select 1"))
+    assert not replica.healthy and replica.ejections == 1
+    await replica.engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_unit_of_work(session: AsyncSession) -> None:
+    user = User(
+        name="Unit Of Work",
+        email="unitofwork@email.com",
+        username="unitofwork",
+        password="not-used",
+    )
+    session.add(user)
+    await session.flush()
+    user_id = user.user_id
+    await session.commit()
+
+    request_session = RequestSession(next(app.dependency_overrides[get_session]()))
+    with note_events.subscribe(user_id) as queue:
+        async with UnitOfWork(request_session):
+            note = await AddNewNote(request_session).execute(
+                AddNoteRequest(title="draft", content="c"), user_id=user_id
+            )
+            # the second use case sees the first one's uncommitted note
+            await UpdateNote(request_session).execute(
+                UpdateNoteRequest(title="final", content="c"),
+                user_id=user_id,
+                note_id=note.note_id,
+            )
+            assert queue.empty()
+
+        events = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert [e.type for e in events] == [NoteEventType.CREATED, NoteEventType.UPDATED]
+
+        # a failing step rolls back the earlier ones, no event goes out
+        with pytest.raises(HTTPException):
+            async with UnitOfWork(request_session):
+                await AddNewNote(request_session).execute(
+                    AddNoteRequest(title="lost", content="c"), user_id=user_id
+                )
+                await DeleteNote(request_session).execute(user_id=user_id, note_id=0)
+        assert queue.empty()
+
+    titles = await session.scalars(select(Note.title).filter(Note.created_by == user_id))
+    assert titles.all() == ["final"]
+    await request_session.close()
+
+
+@pytest.mark.anyio
+async def test_read_your_writes_cookie(
+    ac: AsyncClient, session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user = User(
+        name="Read Your Writes",
+        email="readyourwrites@email.com",
+        username="readyourwrites",
+        password="not-used",
+    )
+    session.add(user)
+    await session.flush()
+    user_id = user.user_id
+    await session.commit()
+    headers = {"Authorization": "Bearer " + generate_access_token(user_id)}
+
+    monkeypatch.setattr(read_session_factory, "replicas", [None])
+    monkeypatch.setattr(db, "recent_writers", TTLCache(maxsize=10, ttl=5))
+
+    response = await ac.get("/api/v1/notes", headers=headers)
+    assert READ_PRIMARY_COOKIE not in response.cookies
+
+    response = await ac.post(
+        "/api/v1/notes", headers=headers, json={"title": "t", "content": "c"}
+    )
+    cookie = response.cookies[READ_PRIMARY_COOKIE]
+
+    # another worker knows nothing of the write but the cookie
+    monkeypatch.setattr(db, "recent_writers", TTLCache(maxsize=10, ttl=5))
+    cookie_header = f"{READ_PRIMARY_COOKIE}={cookie}".encode()
+    request = Request({"type": "http", "headers": [(b"cookie", cookie_header)]})
+    assert reads_primary(request, user_id)
+    assert not reads_primary(Request({"type": "http", "headers": []}), user_id)
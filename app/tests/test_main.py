@@ -1,5 +1,22 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import create_engine, delete, insert
+
+from models import User
+from models.note import Note
+from models.user_note_stats import UserNoteStats
+from settings import settings
+
+MAIN = Path(__file__).parents[1] / "main.py"
 
 
 @pytest.mark.anyio
@@ -7,4 +24,97 @@ async def test_health(ac: AsyncClient) -> None:
     response = await ac.get(
         "/api/v1/health",
     )
-    assert 200 == response.status_code
\ No newline at end of file
+    assert 200 == response.status_code
+
+@pytest.mark.anyio
+async def test_metrics(ac: AsyncClient) -> None:
+    response = await ac.get(
+        "/api/v1/health/metrics",
+    )
+    assert 200 == response.status_code
+    assert "access_token_cache" in response.json()["data"]
+    assert "wait_ms_max" in response.json()["data"]["db_pool"]
+
+
+def run_command(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(MAIN), *args],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def test_import_command(tmp_path: Path) -> None:
+    engine = create_engine(settings.DB_DSN.replace("+asyncpg", ""))
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            insert(User)
+            .values(
+                name="Import Command",
+                email="importcommand@email.com",
+                username="importcommand",
+                password="not-used",
+            )
+            .returning(User.user_id)
+        ).scalar()
+
+    try:
+        path = tmp_path / "notes.csv"
+        path.write_text(f"title,content,created_by\na,b,{user_id}\nc,d,{user_id}\n")
+        result = run_command("import", str(path))
+        assert result.returncode == 0, result.stderr
+        assert "imported 2 notes, 0 failed rows" in result.stdout
+
+        """Unsupported format or missing file: a usage error, no traceback"""
+        result = run_command("import", str(tmp_path / "notes.txt"))
+        assert result.returncode == 1
+        assert "unsupported import format 'txt'" in result.stderr
+        assert "Traceback" not in result.stderr
+
+        result = run_command("import", str(tmp_path / "missing.csv"))
+        assert result.returncode == 1
+        assert "no such file" in result.stderr
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(Note).where(Note.created_by == user_id))
+            conn.execute(
+                delete(UserNoteStats).where(UserNoteStats.user_id == user_id)
+            )
+            conn.execute(delete(User).where(User.user_id == user_id))
+        engine.dispose()
+
+
+def test_serve_command() -> None:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = subprocess.Popen(
+        [sys.executable, str(MAIN), "serve", "2"],
+        env={**os.environ, "PORT": str(port)},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            assert server.poll() is None, server.stdout.read()
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/api/v1/health")
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.2)
+        assert response.status_code == 200
+
+        """SIGTERM stops the workers and the supervisor"""
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+        output = server.stdout.read()
+        assert output.count("Started server process") == 2
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
@@ -0,0 +1,183 @@
+import asyncio
+from typing import AsyncGenerator
+
+import pytest
+
+from utils.cache import (
+    CacheBackend,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    SingleFlight,
+    TTLCache,
+)
+
+
+def test_ttl_cache() -> None:
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is the least recently used entry
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+
+    assert cache.add("c", 5) is False
+    assert cache.add("e", 5, ttl=0) is True
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.fixture
+async def resp_server() -> AsyncGenerator:
+    """Tiny stand-in speaking the subset of RESP used by RedisCacheBackend.
+
+    GET replies for keys starting with "slow:" are delayed.
+    """
+    data = {}
+
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while not reader.at_eof():
+            line = await reader.readline()
+            if not line:
+                break
+            args = []
+            for _ in range(int(line[1:])):
+                size = int((await reader.readline())[1:])
+                args.append((await reader.readexactly(size + 2))[:-2])
+
+            match args[0].upper():
+                case b"GET":
+                    if args[1].startswith(b"slow:"):
+                        await asyncio.sleep(0.1)
+                    value = data.get(args[1])
+                    if value is None:
+                        writer.write(b"$-1\r\n")
+                    else:
+                        writer.write(b"$%d\r\n%s\r\n" % (len(value), value))
+                case b"SET":
+                    if b"NX" in args[3:] and args[1] in data:
+                        writer.write(b"$-1\r\n")
+                    else:
+                        data[args[1]] = args[2]
+                        writer.write(b"+OK\r\n")
+                case b"DEL":
+                    removed = sum(data.pop(k, None) is not None for k in args[1:])
+                    writer.write(b":%d\r\n" % removed)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.anyio
+async def test_redis_cache_backend(resp_server: int) -> None:
+    cache = RedisCacheBackend(url=f"redis://127.0.0.1:{resp_server}/0", ttl=60)
+
+    assert await cache.get("note:1") is None
+    await cache.set("note:1", b'{"note_id": 1}')
+    assert await cache.get("note:1") == b'{"note_id": 1}'
+    await cache.delete("note:1")
+    assert await cache.get("note:1") is None
+
+    # add never replaces, set_many goes out as one pipeline
+    await cache.set_many(["note:1", "note:2"], b"", ttl=5)
+    await cache.add("note:1", b'{"note_id": 1}')
+    assert await cache.get("note:1") == b""
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.anyio
+async def test_redis_cache_backend_cancelled(resp_server: int) -> None:
+    cache = RedisCacheBackend(url=f"redis://127.0.0.1:{resp_server}/0", ttl=60)
+    await cache.set("slow:1", b"1")
+    await cache.set("note:2", b"2")
+
+    # the cancelled GET's reply is still on its way, the next GET must not read it
+    get = asyncio.ensure_future(cache.get("slow:1"))
+    await asyncio.sleep(0.05)
+    get.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await get
+    assert await cache.get("note:2") == b"2"
+
+
+@pytest.mark.anyio
+async def test_cache_backend_unavailable() -> None:
+    cache = RedisCacheBackend(url="redis://127.0.0.1:1/0", ttl=60)
+    assert await cache.get("note:1") is None
+    assert cache.stats()["errors"] == 1
+
+    memory = MemoryCacheBackend(maxsize=10, ttl=60)
+    await memory.set("note:1", b"1")
+    assert await memory.get("note:1") == b"1"
+
+
+def test_cache_backend_interface() -> None:
+    class Incomplete(CacheBackend):
+        async def get(self, key: str) -> bytes | None:
+            return None
+
+    # a backend missing a method fails when it is created, not on first use
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.anyio
+async def test_single_flight() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    results = await asyncio.gather(*(flight.do(1, fetch) for _ in range(5)))
+    assert results == [42] * 5
+    assert calls == 1
+    assert flight.shared == 4
+
+    async def fail() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *(flight.do(1, fail) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.anyio
+async def test_single_flight_leader_cancelled() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    leader = asyncio.ensure_future(flight.do(1, fetch))
+    await asyncio.sleep(0)
+    followers = asyncio.gather(*(flight.do(1, fetch) for _ in range(3)))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    # the followers fetch again instead of failing with the leader
+    assert await followers == [42] * 3
+    assert calls == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
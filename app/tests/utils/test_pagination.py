@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User
+from utils.pagination import estimate_count
+
+
+@pytest.mark.anyio
+async def test_estimate_count(session: AsyncSession) -> None:
+    # the escape character and a ":name" lookalike reach the planner as parameters
+    query = select(User.user_id).filter(
+        User.username.ilike("%a :word\\_%", escape="\\")
+    )
+    assert await estimate_count(session, query) >= 0
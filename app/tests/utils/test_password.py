@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from utils.password import PasswordHasher
+
+
+@pytest.mark.anyio
+async def test_password_hasher_limit() -> None:
+    hasher = PasswordHasher(workers=1, queue_limit=1, retry_after=3)
+
+    """Saturated"""
+    running = [asyncio.ensure_future(hasher._run(time.sleep, 0.2)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as e:
+        await hasher._run(time.sleep, 0)
+    assert e.value.status_code == 503
+    assert e.value.headers == {"Retry-After": "3"}
+
+    """A cancelled caller keeps its slot until the call is done"""
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    # the queued call was dropped, the running one still holds the thread
+    assert hasher.pending == 1
+
+    await asyncio.sleep(0.3)
+    assert hasher.pending == 0
+    assert await hasher.check("secret", await hasher.hash("secret"))
+    hasher.shutdown()
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, TypeVar
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after at most ttl seconds.
+
+    Not thread safe; meant to be used from the event loop of a single worker.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store value; ttl can only shorten the cache wide ttl."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if not self.enabled or ttl <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def add(self, key: Hashable, value: Any, ttl: float | None = None) -> bool:
+        """Store value unless key holds a live entry; True when stored."""
+        item = self._data.get(key)
+        if item is not None and item[0] > time.monotonic():
+            return False
+
+        self.set(key, value, ttl=ttl)
+        return True
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into a single execution."""
+
+    def __init__(self) -> None:
+        self.shared = 0
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        while (future := self._calls.get(key)) is not None:
+            self.shared += 1
+            try:
+                # shield: a waiter going away must not cancel the call others wait on
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # the caller running fn was cancelled (e.g. its client went away),
+                # this one was not: run or join the next call instead
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # retrieved here so asyncio does not warn when nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def forget(self, key: Hashable) -> None:
+        """Let later calls for key start afresh instead of joining the running one."""
+        self._calls.pop(key, None)
+
+
+class CacheBackend(ABC):
+    """Async byte cache shared by the in-process and the redis backends."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes) -> None:
+        """Store value unless key holds one already."""
+
+    @abstractmethod
+    async def set_many(self, keys: Iterable[str], value: bytes, ttl: float) -> None:
+        """Store the same value under every key for ttl seconds."""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict[str, Any]:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.cache.set(key, value)
+
+    async def add(self, key: str, value: bytes) -> None:
+        self.cache.add(key, value)
+
+    async def set_many(self, keys: Iterable[str], value: bytes, ttl: float) -> None:
+        for key in keys:
+            self.cache.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.cache.delete(key)
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "memory", **self.cache.stats()}
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCacheBackend(CacheBackend):
+    """Minimal RESP client speaking GET/SET PX/DEL over one connection.
+
+    Works with redis or anything speaking its protocol (valkey, dragonfly,
+    a local stand-in). Cache errors are logged and reported as misses,
+    so an unavailable server never fails a request.
+    """
+
+    def __init__(self, url: str, ttl: float, timeout: float = 1.0) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = asyncio.Lock()
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._send("AUTH", self.password)
+        if self.db:
+            await self._send("SELECT", self.db)
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _send(self, *args: Any) -> Any:
+        (reply,) = await self._send_many([args])
+        return reply
+
+    async def _send_many(self, commands: list[tuple]) -> list[Any]:
+        # pipelined: every command is written before the first reply is read
+        payload = []
+        for args in commands:
+            payload.append(f"*{len(args)}\r\n".encode())
+            for arg in args:
+                arg = arg if isinstance(arg, bytes) else str(arg).encode()
+                payload.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._writer.write(b"".join(payload))
+        await self._writer.drain()
+        return [await self._read_reply() for _ in commands]
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readuntil(b"\r\n")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body
+        if prefix == b"-":
+            raise RedisError(body.decode())
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            if int(body) < 0:
+                return None
+            data = await self._reader.readexactly(int(body) + 2)
+            return data[:-2]
+        if prefix == b"*":
+            if int(body) < 0:
+                return None
+            return [await self._read_reply() for _ in range(int(body))]
+        raise RedisError(f"unexpected reply {line!r}")
+
+    async def _command(self, *args: Any) -> Any:
+        replies = await self._pipeline([args])
+        return None if replies is None else replies[0]
+
+    async def _pipeline(self, commands: list[tuple]) -> list[Any] | None:
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout)
+                return await asyncio.wait_for(self._send_many(commands), self.timeout)
+            except (OSError, EOFError, asyncio.TimeoutError, RedisError) as e:
+                # the connection state is unknown after a failure, start over next time
+                self._close()
+                self.errors += 1
+                logger.warning("cache command %s failed: %s", commands[0][0], e)
+                return None
+            except BaseException:
+                # cancelled mid command: its reply would be read by the next one
+                self._close()
+                raise
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self._command("GET", key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self._command("SET", key, value, "PX", int(self.ttl * 1000))
+
+    async def add(self, key: str, value: bytes) -> None:
+        await self._command("SET", key, value, "PX", int(self.ttl * 1000), "NX")
+
+    async def set_many(self, keys: Iterable[str], value: bytes, ttl: float) -> None:
+        commands = [("SET", key, value, "PX", int(ttl * 1000)) for key in keys]
+        if commands:
+            await self._pipeline(commands)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._command("DEL", *keys)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def create_cache_backend(
+    backend: str, url: str, maxsize: int, ttl: float
+) -> CacheBackend | None:
+    """Backend named by a *_CACHE_BACKEND setting: memory, redis or none."""
+    match backend:
+        case "memory":
+            return MemoryCacheBackend(maxsize=maxsize, ttl=ttl)
+        case "redis":
+            return RedisCacheBackend(url=url, ttl=ttl)
+        case "none":
+            return None
+    raise ValueError(f"unsupported cache backend: {backend}")
@@ -0,0 +1,21 @@
+import hashlib
+from typing import Any
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag over the string form of parts."""
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check, which uses the weak comparison (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
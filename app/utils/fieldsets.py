@@ -0,0 +1,34 @@
+from functools import lru_cache
+from typing import get_type_hints
+
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+
+def parse_fields(schema: type[BaseModel], fields: str | None) -> tuple[str, ...] | None:
+    """
+    Field names requested by a comma separated fields= param, in schema order so
+    every spelling of the same set shares one partial model (None when absent).
+    """
+    if fields is None:
+        return None
+
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - schema.__fields__.keys()
+    if not requested or unknown:
+        allowed = ", ".join(schema.__fields__)
+        raise HTTPException(400, f"fields must be a comma separated subset of: {allowed}")
+
+    return tuple(f for f in schema.__fields__ if f in requested)
+
+
+@lru_cache(maxsize=256)
+def partial_schema(schema: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """Model carrying only fields of schema, built once per field set."""
+    hints = get_type_hints(schema)
+    return create_model(
+        f"{schema.__name__}[{','.join(fields)}]",
+        __config__=schema.__config__,
+        **{f: (hints[f], ...) for f in fields},
+    )
+
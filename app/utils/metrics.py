@@ -0,0 +1,12 @@
+from typing import Any, Callable
+
+_collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, collector: Callable[[], dict[str, Any]]) -> None:
+    """Register a callable returning the current counters of a component."""
+    _collectors[name] = collector
+
+
+def collect_metrics() -> dict[str, dict[str, Any]]:
+    return {name: collector() for name, collector in _collectors.items()}
@@ -0,0 +1,98 @@
+import base64
+import datetime
+import json
+import math
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from api.base.base_schemas import CountMode, PaginationMetaResponse, PaginationParams
+
+
+def encode_cursor(*values: Any) -> str:
+    """Pack keyset values into an opaque, url-safe cursor token."""
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime.datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """Unpack a token produced by encode_cursor, coercing each value to the given type."""
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode())
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor does not match the expected shape")
+
+        return tuple(
+            datetime.datetime.fromisoformat(v) if t is datetime.datetime else t(v)
+            for v, t in zip(values, types)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a query, executed with the query's bound parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, query: Select) -> None:
+        self.query = query
+
+
+@compiles(Explain)
+def compile_explain(element: Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.query, **kw)
+
+
+async def estimate_count(session: AsyncSession, query: Select) -> int:
+    """Row estimate for query taken from the planner instead of a count scan."""
+    plan = await session.execute(Explain(query))
+    plan = plan.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_total(
+    session: AsyncSession, query: Select, mode: CountMode
+) -> int | None:
+    """Total rows matched by query, as requested by mode (None when skipped)."""
+    if mode is CountMode.NONE:
+        return None
+
+    if mode is CountMode.ESTIMATE:
+        return await estimate_count(session, query)
+
+    total_item = await session.execute(
+        select(func.count()).select_from(query.subquery())
+    )
+    return total_item.scalar()
+
+
+def build_pagination_meta(
+    page_params: PaginationParams,
+    total_item: int | None,
+    has_next: bool,
+    next_cursor: str | None = None,
+) -> PaginationMetaResponse:
+    return PaginationMetaResponse(
+        total_item=total_item,
+        page=page_params.page,
+        item_per_page=page_params.item_per_page,
+        total_page=(
+            None
+            if total_item is None
+            else math.ceil(total_item / page_params.item_per_page)
+        ),
+        has_next=has_next,
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+from fastapi import HTTPException
+
+from settings import settings
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so hashing never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, and its own pool keeps it from taking
+    the threads FastAPI uses for sync code. Requests beyond workers + queue_limit
+    are rejected with 503 instead of queueing.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, retry_after: int) -> None:
+        self.workers = workers
+        self.max_pending = workers + queue_limit
+        self.retry_after = retry_after
+        self.pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # created on first use, so every server worker process gets its own pool
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hasher"
+            )
+        return self._executor
+
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="server is busy, please try again later",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(fn, *args)
+        self.pending += 1
+        # released once bcrypt is done: a cancelled caller stops waiting, but the
+        # call keeps its thread until it finishes
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._release)
+        )
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed_pw = await self._run(bcrypt.hashpw, password.encode(), bcrypt.gensalt())
+        return hashed_pw.decode()
+
+    async def check(self, password: str, hashed_password: str) -> bool:
+        return await self._run(
+            bcrypt.checkpw, password.encode(), hashed_password.encode()
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
@@ -0,0 +1,15 @@
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def model_response(
+    model: BaseModel,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> ORJSONResponse:
+    """
+    Serialize an already validated response model straight to JSON. Returning a
+    Response skips FastAPI's second validation against the route's response_model,
+    so build the model from validated parts (construct() is fine for the envelope).
+    """
+    return ORJSONResponse(model.dict(), status_code=status_code, headers=headers)
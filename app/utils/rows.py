@@ -0,0 +1,19 @@
+from typing import Iterable, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Row
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+
+def rows_to_schema(schema: type[Schema], rows: Iterable[Row]) -> list[Schema]:
+    """
+    Map rows of a column-projected select onto schema without ORM entities and
+    without validation: the database already enforces the column types. Columns
+    the schema does not declare (keyset, rank) are dropped.
+    """
+    names = tuple(schema.__fields__)
+    return [
+        schema.construct(**{name: row._mapping[name] for name in names})
+        for row in rows
+    ]